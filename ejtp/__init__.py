@@ -20,13 +20,17 @@ along with the Python EJTP library.  If not, see
 __all__ = [
 	'address',
 	'applications',
+	'bench',
 	'client',
 	'config',
 	'crypto',
+	'dispatch',
 	'frame',
 	'identity',
 	'jacks',
+	'metrics',
 	'router',
 	'tests',
+	'trace',
 	'util',
 ]
@@ -19,7 +19,10 @@ along with the Python EJTP library.  If not, see
 
 __all__ = [
 	'client',
+	'logstore',
 	'server',
+	'sharded',
+	'store',
 ]
 
 from ejtp.applications.ejforward.client import ForwardClient
@@ -34,6 +34,9 @@ class ForwardClient(Client):
         self.serveraddr = serveraddr
         self._status = {}
         self._status_callbacks = []
+        self._stream_start = None # Start of the stream being received
+        self._next_seq = None     # seq of the next message expected in it
+        self._held = {}           # seq -> messages of batches past a gap
 
     def rcv_callback(self, msg, client_obj):
         data = msg.unpack()
@@ -46,13 +49,45 @@ class ForwardClient(Client):
         elif mtype=='ejforward-message':
             internal = RawData(data['data'])
             self.ack([hashfunc(internal)])
-            try:
-                self.send(frame.createFrame(internal)) # forward to router
-            except ValueError:
-                logger.warning("Invalid frame, discarding")
+            self.forward(internal)
+        elif mtype=='ejforward-batch':
+            self.receive_batch(data)
         else:
             logger.warning("Unknown message type, %r" % mtype)
 
+    def receive_batch(self, data):
+        '''
+        Forward a streamed batch once every batch before it has arrived,
+        then acknowledge everything forwarded so far. Batches past a gap
+        are held, so a lost batch is never acknowledged. Streaming stalls
+        until the missing batch arrives or stream() is called again, which
+        starts a new stream resending everything unacknowledged.
+        '''
+        start = data.get('start', data['seq'])
+        if self._stream_start is None or start > self._stream_start:
+            self._stream_start = self._next_seq = start
+            self._held = {}
+        elif start < self._stream_start or data['seq'] < self._next_seq:
+            return # Left over from an earlier stream, or a duplicate
+        self._held[data['seq']] = data['messages']
+        if data['seq'] != self._next_seq:
+            return
+        while self._next_seq in self._held:
+            messages = self._held.pop(self._next_seq)
+            for internal in messages:
+                self.forward(internal)
+            self._next_seq += len(messages)
+        self.ack_through(self._next_seq - 1)
+
+    def forward(self, internal):
+        '''
+        Pass a delivered frame on to the router.
+        '''
+        try:
+            self.send(frame.createFrame(internal))
+        except ValueError:
+            logger.warning("Invalid frame, discarding")
+
     def ack(self, hashes):
         self.upload(
             'ejforward-ack',
@@ -61,6 +96,29 @@ class ForwardClient(Client):
             },
         )
 
+    def ack_through(self, seq):
+        '''
+        Acknowledge every streamed message up to and including seq.
+        '''
+        self.upload(
+            'ejforward-ack-through',
+            {
+                'seq': seq,
+            },
+        )
+
+    def stream(self, window=None):
+        '''
+        Ask the server to push stored messages in batches, keeping at most
+        window messages unacknowledged. Call again after reconnecting.
+        '''
+        self.upload(
+            'ejforward-stream',
+            {
+                'window': window,
+            },
+        )
+
     def retrieve(self, hashes=None):
         '''
         Get the current status according to the server.
@@ -88,6 +146,8 @@ class ForwardClient(Client):
         Send a message to the server.
         '''
         data['type'] = dtype
+        # Servers only send packed frames to clients that can read them
+        data['packed'] = True
         self.write_json(self.serveraddr, data)
 
     @property
@@ -0,0 +1,374 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+
+'''
+    Durable append-log storage backend for ForwardServer.
+
+    Every change is appended to numbered segment files in a directory:
+
+        C  a client was set up
+        A  a message was stored (with its content)
+        D  a message was acked or evicted
+
+    Only an index of where each live message's content sits in the log is
+    kept in memory. Writes are group-committed: the log is fsynced at most
+    once per sync_interval, covering every record written since the last
+    sync. Once enough of the sealed segments is dead weight, their live
+    records are copied forward and the segments removed.
+
+    Each record carries a CRC of its header and contents. On startup the
+    log is replayed to rebuild the index, stopping at the first record that
+    is torn or fails its CRC: that record and everything after it is
+    discarded, and later segments are renamed to *.log.bad for inspection.
+'''
+
+import logging
+logger = logging.getLogger(__name__)
+
+import os
+import struct
+import threading
+import time
+import zlib
+from itertools import islice
+
+from persei import RawData, String
+
+from ejtp.address import str_address
+from ejtp.util.compat import OrderedDict
+
+__all__ = ['LogStorage', 'LogMessageStore']
+
+OP_CREATE = b'C'
+OP_ADD    = b'A'
+OP_DELETE = b'D'
+
+# op, sequence number, address length, hash length, content length, CRC
+_header = struct.Struct('>cQHBII')
+
+def _crc(fields, body):
+    # CRC32 of the packed header fields before the CRC, then the body
+    return zlib.crc32(body, zlib.crc32(fields)) & 0xffffffff
+
+class LogMessageStore(object):
+    '''
+    One client's queue in a LogStorage. Provides the same methods as
+    MessageStore, with content read back from the log on demand.
+    '''
+
+    def __init__(self, log, address):
+        self._log = log
+        self._address = address
+        # hash -> (sequence, segment, offset, length, record size), oldest first
+        self._index = OrderedDict()
+        self.space = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, mhash):
+        return mhash in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def __getitem__(self, mhash):
+        return self._log._read(self._index[mhash])
+
+    def push(self, mhash, content):
+        if not isinstance(content, bytes):
+            content = RawData(content).export()
+        # Under the log's lock, which compaction holds while moving entries
+        with self._log._lock:
+            if mhash in self._index:
+                return False
+            self._index[mhash] = self._log._append(OP_ADD, self._address, mhash, content)
+            self.space += len(content)
+        return True
+
+    def peek(self, n):
+        with self._log._lock:
+            return list(islice(self._index.keys(), n))
+
+    def remove(self, mhash):
+        with self._log._lock:
+            location = self._index.pop(mhash)
+            self._log._append(OP_DELETE, self._address, mhash)
+            self.space -= location[3]
+            self._log._release(location)
+        return location[3]
+
+    def evict_oldest(self):
+        with self._log._lock:
+            mhash = next(iter(self._index))
+            return mhash, self.remove(mhash)
+
+
+class LogStorage(object):
+    '''
+    Storage backend keeping ForwardServer queues in an append-only log.
+
+    path           directory holding the segment files, created if missing
+    segment_size   size in bytes at which a new segment is started
+    sync_interval  most seconds a written record may wait for its fsync
+    compact_ratio  fraction of dead bytes in sealed segments that triggers
+                   compaction
+
+    >>> import tempfile, shutil
+    >>> path = tempfile.mkdtemp()
+    >>> storage = LogStorage(path)
+    >>> messages = storage.create(['local', None, 'client'])
+    >>> messages.push(String('abc'), b'content')
+    True
+    >>> storage.close()
+    >>> storage = LogStorage(path)
+    >>> storage.clients()
+    [String('["local",null,"client"]')]
+    >>> messages = storage.create(['local', None, 'client'])
+    >>> messages.peek(5)
+    [String('abc')]
+    >>> messages[String('abc')] == b'content'
+    True
+    >>> storage.close()
+    >>> shutil.rmtree(path)
+    '''
+
+    def __init__(self, path, segment_size=4*1024*1024, sync_interval=0.05, compact_ratio=0.5):
+        self.path = path
+        self.segment_size = segment_size
+        self.sync_interval = sync_interval
+        self.compact_ratio = compact_ratio
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self._lock = threading.RLock()
+        self._stores = {}      # address -> LogMessageStore
+        self._created = {}     # address -> segment holding its C record
+        self._sizes = {}       # segment -> bytes written
+        self._live = {}        # segment -> bytes of live records, headers included
+        self._readers = {}     # segment -> open file for reading
+        self._sequence = 0
+        self._last_sync = time.time()
+        self._timer = None
+        self._recover()
+
+    # BACKEND INTERFACE -------------------------------------------------------
+
+    def create(self, address):
+        address = str_address(address)
+        with self._lock:
+            if address not in self._stores:
+                self._stores[address] = LogMessageStore(self, address)
+                self._append(OP_CREATE, address)
+                self._created[address] = self._segment
+            return self._stores[address]
+
+    def clients(self):
+        return list(self._stores.keys())
+
+    def close(self):
+        with self._lock:
+            self.sync()
+            self._writer.close()
+            for reader in self._readers.values():
+                reader.close()
+            self._readers = {}
+
+    # DURABILITY --------------------------------------------------------------
+
+    def sync(self):
+        '''
+        Flush and fsync everything written so far.
+        '''
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._writer.closed:
+                return
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+            self._last_sync = time.time()
+
+    def compact(self):
+        '''
+        Copy live records out of every sealed segment into the current one,
+        then delete the sealed segments.
+
+        Sealed segments are always compacted together, oldest first, so a
+        delete record is never dropped while the record it deletes survives.
+        '''
+        with self._lock:
+            sealed = sorted(s for s in self._sizes if s != self._segment)
+            if not sealed:
+                return
+            for address, segment in list(self._created.items()):
+                if segment in sealed:
+                    self._append(OP_CREATE, address)
+                    self._created[address] = self._segment
+            for address, store in self._stores.items():
+                for mhash, location in list(store._index.items()):
+                    if location[1] in sealed:
+                        content = self._read(location)
+                        store._index[mhash] = self._append(
+                            OP_ADD, address, mhash, content, sequence=location[0])
+            self.sync()
+            for segment in sealed:
+                reader = self._readers.pop(segment, None)
+                if reader:
+                    reader.close()
+                os.remove(self._segment_path(segment))
+                del self._sizes[segment]
+                del self._live[segment]
+
+    # INTERNALS ---------------------------------------------------------------
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, '%08d.log' % segment)
+
+    def _segments(self):
+        names = [n for n in os.listdir(self.path) if n.endswith('.log')]
+        return sorted(int(n[:-4]) for n in names if n[:-4].isdigit())
+
+    def _open_segment(self, segment):
+        self._segment = segment
+        self._writer = open(self._segment_path(segment), 'ab')
+        self._sizes.setdefault(segment, self._writer.tell())
+        self._live.setdefault(segment, 0)
+
+    def _append(self, op, address, mhash=None, content=b'', sequence=None):
+        # Write one record, returning the location of its content
+        address = address.export().encode('utf-8')
+        mhash = mhash.export().encode('utf-8') if mhash is not None else b''
+        with self._lock:
+            if sequence is None:
+                self._sequence += 1
+                sequence = self._sequence
+            if self._sizes[self._segment] >= self.segment_size:
+                self._writer.close()
+                self._open_segment(self._segment + 1)
+            segment = self._segment
+            fields = _header.pack(op, sequence, len(address), len(mhash), len(content), 0)[:-4]
+            body = address + mhash + content
+            header = fields + struct.pack('>I', _crc(fields, body))
+            self._writer.write(header + body)
+            size = len(header) + len(address) + len(mhash) + len(content)
+            offset = self._sizes[segment] + size - len(content)
+            self._sizes[segment] += size
+            if op != OP_DELETE:
+                # Live until deleted, or for C records, superseded
+                self._live[segment] += size
+            self._schedule_sync()
+        return (sequence, segment, offset, len(content), size)
+
+    def _schedule_sync(self):
+        if time.time() - self._last_sync >= self.sync_interval:
+            self.sync()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.sync_interval, self.sync)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _read(self, location):
+        sequence, segment, offset, length, size = location
+        with self._lock:
+            if segment == self._segment:
+                self._writer.flush()
+            reader = self._readers.get(segment)
+            if reader is None:
+                reader = self._readers[segment] = open(self._segment_path(segment), 'rb')
+            reader.seek(offset)
+            return reader.read(length)
+
+    def _release(self, location):
+        # Account for a record becoming dead, compacting if worthwhile
+        sequence, segment, offset, length, size = location
+        with self._lock:
+            if segment in self._live:
+                self._live[segment] -= size
+            sealed = [s for s in self._sizes if s != self._segment]
+            total = sum(self._sizes[s] for s in sealed)
+            if total and total - sum(self._live[s] for s in sealed) > total * self.compact_ratio:
+                self.compact()
+
+    def _recover(self):
+        entries = {} # address -> {hash: location}
+        segments = self._segments()
+        for i, segment in enumerate(segments):
+            if not self._replay(segment, entries):
+                # Records after a bad one can't be trusted to follow it
+                for later in segments[i+1:]:
+                    path = self._segment_path(later)
+                    logger.warning("Discarding %s after a bad record", path)
+                    os.rename(path, path + '.bad')
+                segments = segments[:i+1]
+                break
+        for address, messages in entries.items():
+            store = LogMessageStore(self, address)
+            for mhash, location in sorted(messages.items(), key=lambda item: item[1][0]):
+                store._index[mhash] = location
+                store.space += location[3]
+                self._live[location[1]] += location[4]
+            self._stores[address] = store
+        for address, segment in self._created.items():
+            self._live[segment] += _header.size + len(address.export().encode('utf-8'))
+        self._open_segment(segments[-1] if segments else 0)
+
+    def _replay(self, segment, entries):
+        # Replay one segment, returning False if it ended in a bad record
+        path = self._segment_path(segment)
+        with open(path, 'rb') as f:
+            end = os.fstat(f.fileno()).st_size
+            position = 0
+            while position + _header.size <= end:
+                header = f.read(_header.size)
+                op, sequence, alen, hlen, clen, crc = _header.unpack(header)
+                if position + _header.size + alen + hlen + clen > end:
+                    break
+                body = f.read(alen + hlen + clen)
+                if _crc(header[:-4], body) != crc:
+                    break
+                try:
+                    address = String(body[:alen].decode('utf-8'))
+                    mhash = String(body[alen:alen+hlen].decode('utf-8'))
+                except UnicodeDecodeError:
+                    break
+                offset = position + _header.size + alen + hlen
+                position = offset + clen
+                self._sequence = max(self._sequence, sequence)
+                if op == OP_CREATE:
+                    entries.setdefault(address, {})
+                    self._created[address] = segment
+                elif op == OP_ADD:
+                    entries.setdefault(address, {})[mhash] = (
+                        sequence, segment, offset, clen, _header.size + alen + hlen + clen)
+                elif op == OP_DELETE:
+                    entries.get(address, {}).pop(mhash, None)
+        self._sizes[segment] = position
+        self._live[segment] = 0
+        if position < end:
+            # Torn or corrupt record, usually a crash during the last write
+            logger.warning("Truncating %s at bad record, offset %d", path, position)
+            with open(path, 'ab') as f:
+                f.truncate(position)
+            return False
+        return True
@@ -19,19 +19,47 @@ along with the Python EJTP library.  If not, see
 import logging
 logger = logging.getLogger(__name__)
 
+import heapq
+import time
+from copy import deepcopy
+
 from persei import RawData, String
 
 from ejtp.client import Client
 from ejtp.address import *
 from ejtp.util.hasher import make as hashfunc
+from ejtp.applications.ejforward.store import MemoryStorage
+from ejtp.util.compat import OrderedDict
 
 class ForwardServer(Client):
-    def __init__(self, router, interface, **kwargs):
+    # Streaming delivery limits
+    batch_size     = 2048 # Max bytes of stored frames per pushed batch
+    default_window = 64   # Max unacked messages in flight per client
+
+    def __init__(self, router, interface, storage=None, message_ttl=None, total_space=None, **kwargs):
+        '''
+        storage is a backend from ejtp.applications.ejforward.store that
+        holds client message queues, in memory by default. Clients recovered
+        by the backend are set up again with their queued messages.
+
+        message_ttl is the number of seconds a message may wait for its
+        client before it is dropped, and total_space caps the bytes stored
+        across all clients, counting content shared between clients once
+        (see stored_space). When total_space is exceeded, the oldest message
+        of whichever client is using the most space is evicted. Both are
+        unlimited by default. Per-client quotas still charge every client
+        for each message queued for it.
+        '''
         Client.__init__(self, router, interface, **kwargs)
         self.client_data = {}
+        self.storage = storage or MemoryStorage()
+        self.message_ttl = message_ttl
+        self.total_space = total_space
+        self.used_space  = 0 # Sum of every client's used_space
+        self._expiry  = [] # heap of (expiry time, address, hash)
+        self._expires = {} # (address, hash) -> expiry time, for live messages
+        self._usage   = [] # heap of (-used_space, address), possibly stale
         self.default_data = {
-            'messages':{},
-            'chopping_block':[],
             'status':{
                 'total_count': 1000,
                 'total_space': 32*1024, # 32kb of space default
@@ -39,6 +67,8 @@ class ForwardServer(Client):
                 'used_space' : 0,
             },
         }
+        for address in self.storage.clients():
+            self.setup_client(address)
 
     def relay(self, msg):
         '''
@@ -66,75 +96,238 @@ class ForwardServer(Client):
         address = str_address(msg.address)
         if address in self.client_data:
             mhash = self.store_message(address, msg.content.export())
-            self.message(address, mhash)
+            if 'stream' in self.client(address):
+                self.push(address)
+            else:
+                self.message(address, mhash)
         else:
             self.send(msg)
 
     def rcv_callback(self, msg, client_obj):
+        self.expire()
         data   = msg.unpack()
         mtype  = data['type']
         target = msg.sender
+        if data.get('packed') and str_address(target) in self.client_data:
+            # Client can read packed frames, see message()
+            self.client(target)['packed'] = True
         if mtype=='ejforward-get-status':
             self.notify(target)
         elif mtype=='ejforward-retrieve':
             client = self.client(target)
-            hashes = data['hashes'] or list(client['messages'].keys())[:5]
+            hashes = data['hashes'] or client['messages'].peek(5)
             for mhash in hashes:
                 self.message(target, mhash)
         elif mtype=='ejforward-ack':
             hashes = data['hashes']
             for mhash in hashes:
                 self.delete_message(target, mhash)
+        elif mtype=='ejforward-stream':
+            self.start_stream(target, data.get('window') or self.default_window)
+        elif mtype=='ejforward-ack-through':
+            self.ack_through(target, data['seq'])
         else:
             logger.warning("Unknown message type, %r" % mtype)
 
     def notify(self, target):
         client = self.client(target)
-        status = client['status']
+        status = dict(client['status'])
         status['type'] = 'ejforward-notify'
-        status['hashes'] = list(client['messages'].keys())[:5]
+        status['hashes'] = client['messages'].peek(5)
         self.write_json(
             target,
             status,
         )
 
     def message(self, target, mhash):
-        self.write_json(
-            target,
-            {
-                'type':'ejforward-message',
-                'target':target,
-                'data':RawData(self.client(target)['messages'][String(mhash)])
-            },
-        )
+        # Packed for clients that say they can read it, so the stored frame
+        # travels as raw bytes instead of a list of integers four times its
+        # size. Older clients can't parse packed frames, so they get JSON.
+        client = self.client(target)
+        content = RawData(client['messages'][String(mhash)])
+        data = {
+            'type':'ejforward-message',
+            'target':target,
+        }
+        if client.get('packed'):
+            data['data'] = content.export()
+            self.write_packed(target, data)
+        else:
+            data['data'] = content
+            self.write_json(target, data)
 
-    def store_message(self, target, content):
-        mhash = hashfunc(content)
+    def start_stream(self, target, window):
+        '''
+        Switch a client to streaming delivery: stored messages are pushed in
+        batches, with at most window messages awaiting acknowledgement.
+
+        Calling this again, e.g. when the client reconnects, resends every
+        message that was in flight.
+        '''
+        client = self.client(target)
+        seq = client['stream']['next_seq'] if 'stream' in client else 0
+        client['stream'] = {
+            'window'  : window,
+            'start'   : seq, # First seq of this stream, so clients spot gaps
+            'next_seq': seq,
+            'inflight': OrderedDict(), # seq -> hash, oldest first
+        }
+        self.push(target)
+
+    def push(self, target):
+        '''
+        Send as many batches to a streaming client as its window allows.
+        '''
         client = self.client(target)
+        stream = client['stream']
+        inflight = stream['inflight']
+        while len(inflight) < stream['window']:
+            # Fresh each time, as sending can ack and push in between
+            sent = set(inflight.values())
+            room = stream['window'] - len(inflight)
+            candidates = client['messages'].peek(len(sent) + room)
+            pending = [mhash for mhash in candidates if mhash not in sent]
+            if not pending:
+                return
+            batch = []
+            size = 0
+            for mhash in pending:
+                content = RawData(client['messages'][mhash]).export()
+                if batch and size + len(content) > self.batch_size:
+                    break
+                batch.append(content)
+                size += len(content)
+                inflight[stream['next_seq'] + len(batch) - 1] = mhash
+                sent.add(mhash)
+            # Advance first, as the client may ack and be pushed to before
+            # write_packed returns
+            seq = stream['next_seq']
+            stream['next_seq'] += len(batch)
+            self.write_packed(
+                target,
+                {
+                    'type':'ejforward-batch',
+                    'target':target,
+                    'start':stream['start'],
+                    'seq':seq,
+                    'messages':batch,
+                },
+            )
+
+    def ack_through(self, target, seq):
+        '''
+        Cumulative acknowledgement of every streamed message up to seq.
+        '''
+        address = str_address(target)
+        client = self.client(address)
+        if 'stream' not in client:
+            return
+        inflight = client['stream']['inflight']
+        while inflight:
+            first = next(iter(inflight))
+            if first > seq:
+                break
+            mhash = inflight.pop(first)
+            if mhash in client['messages']: # May have expired or been evicted
+                self.delete_message(address, mhash)
+        self.push(address)
 
-        client['messages'][mhash] = content
-        client['chopping_block'].append(mhash)
-        client['status']['used_count'] += 1
-        client['status']['used_space'] += len(content)
-        self.trim(target)
+    def store_message(self, target, content):
+        mhash = hashfunc(content)
+        address = str_address(target)
+        client = self.client(address)
+        self.expire()
+
+        if client['messages'].push(mhash, content):
+            self._account(address, client, mhash, 1, len(content))
+            self.trim(address)
+            self.trim_global()
         return mhash
 
     def delete_message(self, target, chophash):
         chophash = String(chophash)
-        client = self.client(target)
-        client['chopping_block'].remove(chophash)
-        chopsize = len(client['messages'][chophash])
-        del client['messages'][chophash]
-        client['status']['used_count'] -= 1
-        client['status']['used_space'] -= chopsize
+        address = str_address(target)
+        client = self.client(address)
+        chopsize = client['messages'].remove(chophash)
+        self._account(address, client, chophash, -1, chopsize)
 
     def trim(self, target):
-        client = self.client(target)
+        address = str_address(target)
+        client = self.client(address)
+        status = client['status']
         while (
-                client['status']['used_count'] > client['status']['total_count']
-            or  client['status']['used_space'] > client['status']['total_space']
+                status['used_count'] > status['total_count']
+            or  status['used_space'] > status['total_space']
               ):
-            self.delete_message(target, client['chopping_block'][0])
+            chophash, chopsize = client['messages'].evict_oldest()
+            self._account(address, client, chophash, -1, chopsize)
+
+    @property
+    def stored_space(self):
+        '''
+        Bytes of message content actually held. Less than used_space when
+        the storage backend keeps content shared by several clients once.
+        '''
+        contents = getattr(self.storage, 'contents', None)
+        if contents is not None:
+            return contents.space
+        return self.used_space
+
+    def trim_global(self):
+        '''
+        Evict messages until total_space is respected, always taking the
+        oldest message of the client using the most space.
+        '''
+        if self.total_space is None:
+            return
+        while self.stored_space > self.total_space and self._usage:
+            negspace, address = heapq.heappop(self._usage)
+            client = self.client_data.get(address)
+            if client is None or client['status']['used_space'] != -negspace:
+                continue # Stale entry, a newer one is in the heap
+            if not len(client['messages']):
+                continue
+            chophash, chopsize = client['messages'].evict_oldest()
+            self._account(address, client, chophash, -1, chopsize)
+
+    def expire(self, now=None):
+        '''
+        Drop every message whose time to live has run out.
+        '''
+        if now is None:
+            now = time.time()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires, address, mhash = heapq.heappop(self._expiry)
+            if self._expires.get((address, mhash)) == expires:
+                self.delete_message(address, mhash)
+
+    def _account(self, address, client, mhash, count, size):
+        # Record a message of size bytes being added (count 1) or removed
+        # (count -1). Kept apart, as messages may be empty.
+        status = client['status']
+        status['used_count'] += count
+        status['used_space'] += count * size
+        self.used_space += count * size
+        if count > 0:
+            self._schedule_expiry(address, mhash)
+        else:
+            self._expires.pop((address, mhash), None)
+        self._usage_changed(address, status)
+
+    def _schedule_expiry(self, address, mhash):
+        if self.message_ttl is not None:
+            expires = time.time() + self.message_ttl
+            self._expires[(address, mhash)] = expires
+            heapq.heappush(self._expiry, (expires, address, mhash))
+
+    def _usage_changed(self, address, status):
+        if self.total_space is not None:
+            if len(self._usage) > 4 * len(self.client_data) + 64:
+                # Drop stale entries before the heap outgrows the clients
+                self._usage = [(-c['status']['used_space'], a)
+                    for (a, c) in self.client_data.items() if 'status' in c]
+                heapq.heapify(self._usage)
+            heapq.heappush(self._usage, (-status['used_space'], address))
 
     def client(self, address):
         '''
@@ -168,18 +361,39 @@ class ForwardServer(Client):
         self.client_data[address] = dict()
         self.client(address).update(data)
 
-    def setup_client(self, address):
+    def setup_client(self, address, total_count=None, total_space=None):
         '''
-        Create a default-configured client.
+        Create a default-configured client, optionally with its own quota
+        for message count and bytes stored.
 
         >>> server = ForwardServer(None, None, make_jack=False)
         >>> address = ['sad thoughts', 'lonely eyes']
         >>> server.setup_client(address)
         >>> from ejtp.util.hasher import strict
         >>> strict(server.client(address))
-        String('{"chopping_block":[],"messages":{},"status":{"total_count":1000,"total_space":32768,"used_count":0,"used_space":0}}')
+        String('{"messages":{},"status":{"total_count":1000,"total_space":32768,"used_count":0,"used_space":0}}')
+        >>> server.setup_client(address, total_count=10)
+        >>> server.client(address)['status']['total_count']
+        10
         '''
-        self.create_client(address, self.default_data)
+        address = str_address(address)
+        if address in self.client_data and 'status' in self.client_data[address]:
+            self.used_space -= self.client_data[address]['status']['used_space']
+        data = deepcopy(self.default_data)
+        messages = data['messages'] = self.storage.create(address)
+        status = data['status']
+        if total_count is not None:
+            status['total_count'] = total_count
+        if total_space is not None:
+            status['total_space'] = total_space
+        status['used_count'] = len(messages)
+        status['used_space'] = messages.space
+        self.used_space += messages.space
+        self.create_client(address, data)
+        for mhash in messages.keys():
+            # Recovered messages start their time to live afresh
+            self._schedule_expiry(address, mhash)
+        self._usage_changed(address, status)
 
 
 _demo_client_addr = ['local', None, 'client']
@@ -0,0 +1,214 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+import logging
+logger = logging.getLogger(__name__)
+
+import os
+import itertools
+import threading
+from multiprocessing import Process, Queue
+
+try:
+    from queue import Empty
+except ImportError:
+    from Queue import Empty
+
+from ejtp.client import Client
+from ejtp.address import *
+from ejtp import frame
+from ejtp import identity
+from ejtp.identity.core import deserialize
+from ejtp.util.hasher import make as hashfunc
+from ejtp.applications.ejforward.server import ForwardServer
+from ejtp.applications.ejforward.logstore import LogStorage
+
+class ShardedForwardServer(Client):
+    def __init__(self, router, interface, shards=2, storage_dir=None, **kwargs):
+        '''
+        Front for an EJForward server whose clients are split across several
+        worker processes. Each client belongs to the shard picked by hashing
+        its address, and that shard runs an ordinary ForwardServer holding
+        only its own clients' data.
+
+        This front does no crypto itself. Incoming frames addressed to it
+        are handed out to the shards in turn, still encrypted, so the
+        private key decryption runs on every core. The shard that decrypts
+        a frame passes the inner frame on to the shard owning it: requests
+        by the address that signed them, relays by the address they are
+        encrypted for. As a result, two frames from one client can be
+        handled out of order, just as datagrams can arrive out of order.
+        Shards answer as this interface, sending their frames back here for
+        the router to deliver.
+
+        storage_dir, if given, keeps each shard's messages in a LogStorage
+        under its own subdirectory. message_ttl and total_space are passed
+        on to every shard, so total_space applies per shard.
+        '''
+        options = {}
+        for key in ('message_ttl', 'total_space'):
+            if key in kwargs:
+                options[key] = kwargs.pop(key)
+        Client.__init__(self, router, interface, **kwargs)
+        self.storage_dir = storage_dir
+        self.options = options
+        self.inboxes = [Queue() for i in range(shards)]
+        self.outbox  = Queue()
+        self.workers = []
+        self._reader = None
+        self._next = itertools.cycle(self.inboxes)
+
+    def start(self):
+        '''
+        Start the shard processes with the identities currently known to
+        this front. Later identities are passed on by update_ident.
+        '''
+        idents = self.encryptor_cache.serialize()
+        for index, inbox in enumerate(self.inboxes):
+            storage_path = None
+            if self.storage_dir:
+                storage_path = os.path.join(self.storage_dir, 'shard-%d' % index)
+            worker = Process(
+                target=_run_shard,
+                args=(self.interface, idents, self.inboxes, index, self.outbox,
+                    storage_path, self.options),
+            )
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+        self._reader = threading.Thread(target=self._read_outbox)
+        self._reader.daemon = True
+        self._reader.start()
+
+    def stop(self):
+        '''
+        Stop the shard processes, letting each finish its queued work.
+        '''
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        if self._reader:
+            self.outbox.put(None)
+            self._reader.join()
+            self._reader = None
+
+    def shard(self, address):
+        '''
+        Index of the shard that owns address. Uses a hash digest rather
+        than hash(), so every process agrees on the answer.
+        '''
+        return shard_index(address, len(self.inboxes))
+
+    def route(self, msg):
+        if isinstance(msg, frame.address.ReceiverCategory) and msg.address == self.interface:
+            # Any shard can decrypt, so spread the work
+            next(self._next).put(('encrypted', msg.content.export()))
+        else:
+            Client.route(self, msg)
+
+    def setup_client(self, address, total_count=None, total_space=None):
+        '''
+        Set up a client on its owning shard, along with its identity.
+        '''
+        address = py_address(address)
+        key = str_address(address)
+        ident = None
+        if key in self.encryptor_cache:
+            ident = self.encryptor_cache[key].serialize()
+        self.inboxes[self.shard(address)].put(
+            ('setup_client', address, ident, total_count, total_space)
+        )
+
+    def update_ident(self, ident):
+        '''
+        Add an identity to this front and every shard.
+        '''
+        self.encryptor_cache.update_ident(ident)
+        for inbox in self.inboxes:
+            inbox.put(('ident', ident.serialize()))
+
+    def _read_outbox(self):
+        # Deliver frames written by the shards
+        while True:
+            data = self.outbox.get()
+            if data is None:
+                return
+            try:
+                self.router.recv(data)
+            except Exception:
+                logger.exception("Could not deliver frame from shard")
+
+def shard_index(address, shards):
+    # Hash digest rather than hash(), which differs between processes
+    digest = hashfunc(str_address(address)).export()
+    return int(digest[:8], 16) % shards
+
+class ShardServer(ForwardServer):
+    '''
+    ForwardServer running inside a shard process. Instead of a router, it
+    writes its outgoing frames to the front's outbox queue.
+    '''
+    # Seconds an idle shard waits before expiring old messages
+    expire_interval = 1.0
+
+    def __init__(self, outbox, interface, **kwargs):
+        self.outbox = outbox
+        ForwardServer.__init__(self, None, interface, make_jack=False, **kwargs)
+
+    def send(self, msg):
+        self.outbox.put(msg.content.export())
+
+def _run_shard(interface, idents, inboxes, index, outbox, storage_path, options):
+    inbox = inboxes[index]
+    cache = identity.IdentityCache()
+    cache.deserialize(idents)
+    storage = storage_path and LogStorage(storage_path)
+    server = ShardServer(outbox, interface, encryptor_cache=cache, storage=storage, **options)
+    while True:
+        try:
+            item = inbox.get(timeout=server.expire_interval)
+        except Empty:
+            server.expire()
+            continue
+        if item is None:
+            break
+        try:
+            if item[0] == 'encrypted':
+                inner = frame.createFrame(item[1]).unpack(cache)
+                if not isinstance(inner, frame.address.AddressCategory):
+                    logger.warning("Frame without an address, discarding: %r", inner)
+                    continue
+                owner = shard_index(inner.address, len(inboxes))
+                if owner == index:
+                    server.route(inner)
+                else:
+                    inboxes[owner].put(('frame', inner.content.export()))
+            elif item[0] == 'frame':
+                server.route(frame.createFrame(item[1]))
+            elif item[0] == 'setup_client':
+                address, ident, total_count, total_space = item[1:]
+                if ident:
+                    cache.update_ident(deserialize(ident))
+                server.setup_client(address, total_count, total_space)
+            elif item[0] == 'ident':
+                cache.update_ident(deserialize(item[1]))
+        except Exception:
+            logger.exception("Shard failed to handle %r", item[0])
+    server.storage.close()
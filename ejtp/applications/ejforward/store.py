@@ -0,0 +1,180 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+
+'''
+    Message storage for ForwardServer.
+
+    Each client's queue is a MessageStore: messages keyed by hash, kept in
+    arrival order, with O(1) insert, ack and eviction of the oldest message.
+
+    Where the queues live is decided by a storage backend, passed to
+    ForwardServer as its storage argument. A backend provides:
+
+        create(address) -> the message store for a client, creating it if
+                           needed. Stores provide the MessageStore methods.
+        clients()       -> addresses of clients recovered from a previous run.
+        close()         -> release any resources held by the backend.
+
+    MemoryStorage is the default. Its stores share one ContentStore, so a
+    message queued for many clients is held in memory once. See
+    ejtp.applications.ejforward.logstore for a durable backend.
+'''
+
+from itertools import islice
+
+from ejtp.util.compat import OrderedDict
+
+__all__ = ['ContentStore', 'MessageStore', 'MemoryStorage']
+
+class ContentStore(object):
+    '''
+    Reference-counted message content, keyed by hash. Each MessageStore
+    holding a message takes a reference, and the content is dropped when
+    the last one is released.
+
+    >>> contents = ContentStore()
+    >>> a = MessageStore(contents=contents)
+    >>> b = MessageStore(contents=contents)
+    >>> a.push('h', 'hello'), b.push('h', 'hello')
+    (True, True)
+    >>> a.space + b.space, contents.space
+    (10, 5)
+    >>> a.remove('h'), len(contents)
+    (5, 1)
+    >>> b.evict_oldest(), len(contents)
+    (('h', 5), 0)
+    '''
+
+    def __init__(self):
+        self._contents = {} # hash -> [content, references]
+        self.space = 0
+
+    def __len__(self):
+        return len(self._contents)
+
+    def __contains__(self, mhash):
+        return mhash in self._contents
+
+    def acquire(self, mhash, content):
+        '''
+        Take a reference to a message, storing content if this hash is new.
+        Returns the stored content, which is shared by every reference.
+        '''
+        entry = self._contents.get(mhash)
+        if entry is None:
+            entry = self._contents[mhash] = [content, 0]
+            self.space += len(content)
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, mhash):
+        '''
+        Drop a reference to a message, and its content if none are left.
+        '''
+        entry = self._contents[mhash]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._contents[mhash]
+            self.space -= len(entry[0])
+
+
+class MessageStore(OrderedDict):
+    '''
+    Ordered mapping of message hash to content.
+
+    >>> store = MessageStore()
+    >>> store.push('a', 'first')
+    True
+    >>> store.push('b', 'second')
+    True
+    >>> store.push('a', 'first')
+    False
+    >>> store.peek(1)
+    ['a']
+    >>> store.evict_oldest()
+    ('a', 5)
+    >>> list(store.keys()), store.space
+    (['b'], 6)
+    '''
+
+    def __init__(self, *args, **kwargs):
+        self.space = 0
+        self.contents = kwargs.pop('contents', None)
+        OrderedDict.__init__(self, *args, **kwargs)
+
+    def push(self, mhash, content):
+        '''
+        Add a message at the back of the queue. Returns False, and leaves the
+        queue untouched, if a message with this hash is already stored.
+        Space is counted per reference, even when the content is shared.
+        '''
+        if mhash in self:
+            return False
+        if self.contents is not None:
+            content = self.contents.acquire(mhash, content)
+        self[mhash] = content
+        self.space += len(content)
+        return True
+
+    def peek(self, n):
+        '''
+        Return up to n hashes, oldest first, without copying the whole queue.
+        '''
+        return list(islice(self.keys(), n))
+
+    def remove(self, mhash):
+        '''
+        Remove a message, returning its size. Raises KeyError if not stored.
+        '''
+        size = len(self.pop(mhash))
+        self.space -= size
+        if self.contents is not None:
+            self.contents.release(mhash)
+        return size
+
+    def evict_oldest(self):
+        '''
+        Remove the oldest message, returning (hash, size).
+        '''
+        mhash, content = self.popitem(last=False)
+        self.space -= len(content)
+        if self.contents is not None:
+            self.contents.release(mhash)
+        return mhash, len(content)
+
+
+class MemoryStorage(object):
+    '''
+    Default storage backend. Nothing survives a restart.
+    '''
+
+    def __init__(self):
+        self.contents = ContentStore()
+        self._stores = {} # address -> MessageStore
+
+    def create(self, address):
+        if address not in self._stores:
+            self._stores[address] = MessageStore(contents=self.contents)
+        return self._stores[address]
+
+    def clients(self):
+        return []
+
+    def close(self):
+        pass
@@ -19,27 +19,70 @@ along with the Python EJTP library.  If not, see
 import logging
 logger = logging.getLogger(__name__)
 
+import os
+import time
+
 from ejtp.client import Client
 from ejtp.address import *
+from ejtp import frame
 
 class MOTDServer(Client):
+    # Seconds between checks of the file for changes
+    check_interval = 0.5
+    # Seconds after a write during which the file's times can't be trusted
+    # to change on the next write, so its content is compared instead
+    fresh_window = 2
+    # Time source for check_interval, and the call that checks the file
+    clock = staticmethod(time.time)
+    stat  = staticmethod(os.stat)
+
     def __init__(self, router, interface, filename, message="", encryptor_cache=None, make_jack=True):
         Client.__init__(self, router, interface, encryptor_cache, make_jack)
         self.filename = filename
         self.message  = message
+        self._response = None # JSON frame sent to every requester
+        self._content  = None # Text it contains
+        self._version  = None # (inode, size, mtime, ctime, message) it was built from
+        self._checked  = None
 
     def rcv_callback(self, msg, client_obj):
-        sender = msg.sender
-        response = None
+        self.owrite([msg.sender], self.response())
+
+    def response(self, now=None):
+        '''
+        Return the response frame, rebuilding it only when the file has
+        changed. The file is checked at most once every check_interval
+        seconds, by its inode, size and times, and by its content while
+        it was modified too recently for its times to tell.
+        '''
+        if now is None:
+            now = self.clock()
+        if self._checked is None or now - self._checked >= self.check_interval:
+            self._checked = now
+            try:
+                stat = self.stat(self.filename)
+                version = (stat.st_ino, stat.st_size, stat.st_mtime, stat.st_ctime, self.message)
+                fresh = time.time() - stat.st_mtime < self.fresh_window
+            except OSError:
+                version = (None, None, None, None, self.message)
+                fresh = False
+            if version != self._version or fresh:
+                content = self.read()
+                if version != self._version or content != self._content:
+                    self._response = frame.json.construct({
+                        'type':'motd-response',
+                        'content': content,
+                    })
+                self._version = version
+                self._content = content
+        return self._response
+
+    def read(self):
         try:
             with open(self.filename) as rfile:
-                response = rfile.read()
+                return rfile.read()
         except:
-            response = self.message
-        self.write_json(sender, {
-            'type':'motd-response',
-            'content': response,
-        })
+            return self.message
 
 class MOTDClient(Client):
     def __init__(self, *args, **kwargs):
@@ -0,0 +1,66 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+__doc__ = '''python -m ejtp.bench
+
+Run every ejtp microbenchmark, optionally saving the results as JSON and
+comparing them against a baseline saved by an earlier run.
+
+Usage:
+    ejtp.bench [options]
+    ejtp.bench -h | --help
+
+Options:
+    -n, --number N       Runs per benchmark, instead of each suite's default
+    -o, --output FILE    Save results to FILE as JSON
+    -b, --baseline FILE  Compare against results saved in FILE
+    -t, --threshold PCT  Slowdown counted as a regression [default: 10]
+    -h --help            Show this help message
+
+Exits with status 1 if any benchmark regressed against the baseline.
+'''
+
+import sys
+
+from ejtp.vendor.docopt import docopt
+from ejtp.bench import core, crypto, ejforward, frames, internals, logs, routing, scale
+
+SUITES = [internals, frames, crypto, ejforward, routing, scale, logs]
+
+def main(argv=None):
+    args = docopt(__doc__, sys.argv[1:] if argv is None else argv)
+    results = []
+    for suite in SUITES:
+        if args['--number']:
+            results.extend(suite.run(int(args['--number'])))
+        else:
+            results.extend(suite.run())
+    core.report(results)
+    if args['--output']:
+        core.save(results, args['--output'])
+    if args['--baseline']:
+        threshold = float(args['--threshold']) / 100
+        regressions = core.compare(results, core.load(args['--baseline']), threshold)
+        for name, before, after in regressions:
+            print("REGRESSION %-40s %12.2f -> %.2f usec/op" % (name, before, after))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
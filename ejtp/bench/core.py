@@ -0,0 +1,92 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+
+
+'''
+    Benchmark core
+
+    Small helpers shared by the microbenchmarks in ejtp.bench. Each
+    benchmark is a plain function taking no arguments, timed with timeit
+    and reported as the best of several repeats.
+
+    Results can be saved as JSON and compared against a saved baseline,
+    see compare().
+'''
+
+import json
+import timeit
+
+__all__ = ['measure', 'report', 'save', 'load', 'compare']
+
+def measure(name, func, number=1000, repeat=3):
+    '''
+    Time func, returning a dict describing the best run.
+
+    >>> result = measure('noop', lambda: None, number=10)
+    >>> sorted(result.keys())
+    ['name', 'number', 'ops_per_sec', 'usec_per_op']
+    '''
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return {
+        'name': name,
+        'number': number,
+        'usec_per_op': best * 1e6 / number,
+        'ops_per_sec': number / best if best else float('inf'),
+    }
+
+def report(results):
+    '''
+    Print a list of results from measure as a table.
+    '''
+    for result in results:
+        print("%-40s %12.2f usec/op %14.1f ops/sec" % (
+            result['name'],
+            result['usec_per_op'],
+            result['ops_per_sec'],
+        ))
+
+def save(results, path):
+    '''
+    Write a list of results to path as JSON.
+    '''
+    with open(path, 'w') as wfile:
+        json.dump(results, wfile, indent=2, sort_keys=True)
+
+def load(path):
+    with open(path) as rfile:
+        return json.load(rfile)
+
+def compare(results, baseline, threshold=0.1):
+    '''
+    Return (name, baseline usec, usec) for each result that is slower than
+    the baseline result of the same name by more than threshold (0.1 is
+    10%). Results missing from either side are ignored.
+
+    >>> old = [{'name': 'a', 'usec_per_op': 10.0}, {'name': 'b', 'usec_per_op': 10.0}]
+    >>> new = [{'name': 'a', 'usec_per_op': 10.5}, {'name': 'b', 'usec_per_op': 12.0}]
+    >>> compare(new, old)
+    [('b', 10.0, 12.0)]
+    '''
+    before = dict((result['name'], result['usec_per_op']) for result in baseline)
+    regressions = []
+    for result in results:
+        old = before.get(result['name'])
+        if old is not None and result['usec_per_op'] > old * (1 + threshold):
+            regressions.append((result['name'], old, result['usec_per_op']))
+    return regressions
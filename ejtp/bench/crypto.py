@@ -0,0 +1,94 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+'''
+    Encryption and compression benchmarks
+
+    Measures encrypt, decrypt, sign and verify for each encryptor type, and
+    compress/decompress for each compression codec, across payload sizes.
+    Encryptors whose backend is missing or unusable are skipped. Run with:
+
+        python -m ejtp.bench.crypto [number]
+'''
+
+import os
+import sys
+
+from ejtp.bench.core import measure, report
+from ejtp.crypto import make
+from ejtp.frame.compressed import _compression_types
+
+SIZES = (64, 1024, 8192)
+
+# PyECC keypair on curve p184, the same one the tests use
+ECC_PUBLIC  = '#&M=6cSQ}m6C(hUz-7j@E=>oS#TL3F[F[a[q9S;RhMh+F#gP|Q6R}lhT_e7b'
+ECC_PRIVATE = '!!![t{l5N^uZd=Bg(P#N|PH#IN8I0,Jq/PvdVNi^PxR,(5~p-o[^hPE#40.<|'
+
+ENCRYPTORS = [
+    ('rotate',   ['rotate', 5]),
+    ('aes',      ['aes', 'benchmark key']),
+    ('rsa-1024', ['rsa', None, 1024]),
+    ('ecc-p184', ['ecc', ECC_PUBLIC, ECC_PRIVATE, 'p184']),
+]
+
+def payload(size):
+    # Half random, half repetitive, so compression has something to do
+    return os.urandom(size // 2) + b'x' * (size - size // 2)
+
+def bench_encryptor(encryptor, size):
+    plaintext  = payload(size)
+    ciphertext = encryptor.encrypt(plaintext)
+    signature  = encryptor.sign(plaintext)
+    return [
+        ('encrypt', lambda: encryptor.encrypt(plaintext)),
+        ('decrypt', lambda: encryptor.decrypt(ciphertext)),
+        ('sign',    lambda: encryptor.sign(plaintext)),
+        ('verify',  lambda: encryptor.sig_verify(plaintext, signature)),
+    ]
+
+def bench_compressor(cls, size):
+    plaintext  = payload(size)
+    compressed = cls(plaintext).compress()
+    return [
+        ('compress',   lambda: cls(plaintext).compress()),
+        ('decompress', lambda: cls(compressed).decompress()),
+    ]
+
+def scaled(number, size):
+    # Fewer runs for bigger payloads, so the slow encryptors finish
+    return max(1, number * SIZES[0] // size)
+
+def run(number=20):
+    results = []
+    for name, proto in ENCRYPTORS:
+        try:
+            encryptor = make(proto)
+        except (ImportError, TypeError):
+            continue # Backend not installed
+        for size in SIZES:
+            for op, func in bench_encryptor(encryptor, size):
+                results.append(measure('crypto.%s %s %dB' % (name, op, size), func, scaled(number, size)))
+    for cls in sorted(_compression_types.values(), key=lambda cls: cls.__name__):
+        for size in SIZES:
+            for op, func in bench_compressor(cls, size):
+                results.append(measure('compress.%s %s %dB' % (cls.__name__, op, size), func, scaled(number, size)))
+    return results
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    report(run(number))
@@ -0,0 +1,81 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+
+
+'''
+    ForwardServer storage benchmarks
+
+    Fills a client up to its default quota of 1000 messages / 32 KB and
+    then churns through stores (which evict the oldest message), status
+    peeks and acks. No crypto is involved. Run with:
+
+        python -m ejtp.bench.ejforward [number]
+'''
+
+import sys
+
+from ejtp.applications.ejforward.server import ForwardServer
+from ejtp.bench.core import measure, report
+
+ADDRESS = ['local', None, 'client']
+
+def filled_server(message_size=32):
+    # A server whose client is at its count and space quota
+    server = ForwardServer(None, None, make_jack=False)
+    server.setup_client(ADDRESS)
+    status = server.client(ADDRESS)['status']
+    i = 0
+    while status['used_count'] < status['total_count']:
+        server.store_message(ADDRESS, ('%0*d' % (message_size, i)).encode())
+        i += 1
+    return server, i
+
+def bench_store_evict():
+    server, i = filled_server()
+    counter = [i]
+    def store():
+        counter[0] += 1
+        server.store_message(ADDRESS, ('%032d' % counter[0]).encode())
+    return store
+
+def bench_store_ack():
+    server, i = filled_server()
+    messages = server.client(ADDRESS)['messages']
+    counter = [i]
+    def churn():
+        counter[0] += 1
+        server.delete_message(ADDRESS, messages.peek(1)[0])
+        server.store_message(ADDRESS, ('%032d' % counter[0]).encode())
+    return churn
+
+def bench_peek():
+    server, i = filled_server()
+    messages = server.client(ADDRESS)['messages']
+    return lambda: messages.peek(5)
+
+def run(number=10000):
+    return [
+        measure('ejforward store (evicting oldest)', bench_store_evict(), number),
+        measure('ejforward ack + store', bench_store_ack(), number),
+        measure('ejforward peek 5 of 1000', bench_peek(), number),
+    ]
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    report(run(number))
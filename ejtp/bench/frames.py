@@ -0,0 +1,61 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+
+
+'''
+    Frame parsing benchmarks
+
+    Measures createFrame throughput, which is the first thing Router.recv
+    does for every incoming frame. Run with:
+
+        python -m ejtp.bench.frames [number]
+'''
+
+import sys
+
+from persei import RawData
+
+from ejtp import frame
+from ejtp.bench.core import measure, report
+
+SAMPLE = b'r["udp4",["127.0.0.1",9002],"pong"]\x00' + b'x' * 256
+
+def bench_createFrame_bytes(data=SAMPLE):
+    return lambda: frame.createFrameFromBytes(data)
+
+def bench_createFrame_rawdata(data=SAMPLE):
+    data = RawData(data)
+    return lambda: frame.createFrame(data)
+
+def bench_createFrame_dispatch(data=SAMPLE):
+    # Lookup cost alone, without the frame constructor
+    dispatch = frame.registration._dispatch
+    byte = bytearray(data[:1])[0]
+    return lambda: dispatch[byte]
+
+def run(number=10000):
+    return [
+        measure('frame.createFrameFromBytes', bench_createFrame_bytes(), number),
+        measure('frame.createFrame(RawData)', bench_createFrame_rawdata(), number),
+        measure('frame.registration._dispatch', bench_createFrame_dispatch(), number),
+    ]
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    report(run(number))
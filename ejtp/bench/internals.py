@@ -0,0 +1,82 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+'''
+    Core helper benchmarks
+
+    Measures the small functions every frame passes through: strict JSON
+    encoding, address conversion, IdentityCache lookups and stream
+    deframing. Run with:
+
+        python -m ejtp.bench.internals [number]
+'''
+
+import sys
+
+from ejtp.address import str_address, py_address
+from ejtp.bench.core import measure, report
+from ejtp.identity import Identity, IdentityCache
+from ejtp.jacks.stream import Connection
+from ejtp.util.hasher import strict
+
+ADDRESS = ['udp4', ['127.0.0.1', 9002], 'pong']
+MESSAGE = {
+    'type': 'ejforward-notify',
+    'hashes': ['4fc5bbbfefe38b84b935fee015c192e397b6eac3'] * 5,
+    'total_count': 1000,
+    'used_space': 13,
+}
+
+def bench_strict(obj=MESSAGE):
+    return lambda: strict(obj)
+
+def bench_str_address(address=ADDRESS):
+    return lambda: str_address(address)
+
+def bench_py_address(address=ADDRESS):
+    straddr = str_address(address).export()
+    return lambda: py_address(straddr)
+
+def bench_cache_lookup(size=1000):
+    cache = IdentityCache()
+    for i in range(size):
+        location = ['udp4', ['127.0.0.1', i], 'client']
+        cache.update_ident(Identity('client%d' % i, ['rotate', i % 256], location))
+    target = ['udp4', ['127.0.0.1', size // 2], 'client']
+    return lambda: cache[target]
+
+def bench_stream_inject(size=256):
+    conn = Connection()
+    data = conn.wrap(b'r["local",null,"a"]\x00' + b'x' * size).export()
+    def inject():
+        conn.inject(data)
+        conn.recv()
+    return inject
+
+def run(number=1000):
+    return [
+        measure('util.hasher.strict(notify)', bench_strict(), number),
+        measure('address.str_address', bench_str_address(), number),
+        measure('address.py_address', bench_py_address(), number),
+        measure('IdentityCache lookup (1000 idents)', bench_cache_lookup(), number),
+        measure('Connection.inject (256 byte frame)', bench_stream_inject(), number),
+    ]
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    report(run(number))
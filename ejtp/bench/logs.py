@@ -0,0 +1,82 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+'''
+    Logging overhead benchmarks
+
+    Shows what per-frame log lines cost while DEBUG is disabled: a lazily
+    formatted call against the eager repr() it replaced, and a full
+    Router.recv with logging at WARNING against logging switched off
+    entirely. Run with:
+
+        python -m ejtp.bench.logs [number]
+'''
+
+import logging
+import sys
+
+from ejtp import frame
+from ejtp.bench.core import measure, report
+from ejtp.client import Client
+from ejtp.router import Router, logger as router_logger
+
+SAMPLE = frame.createFrame(b'r["local",null,"nobody"]\x00' + b'x' * 256)
+
+def bench_debug_lazy(msg=SAMPLE):
+    return lambda: router_logger.debug("Handling frame: %r", msg)
+
+def bench_debug_eager(msg=SAMPLE):
+    return lambda: router_logger.debug("Handling frame: %s", repr(msg))
+
+def bench_router_recv():
+    router = Router()
+    sender   = Client(router, ['local', None, 'sender'], make_jack=False)
+    receiver = Client(router, ['local', None, 'receiver'], make_jack=False)
+    sender.encryptor_cache = receiver.encryptor_cache
+    sender.encryptor_set(sender.interface, ['rotate', 3])
+    sender.encryptor_set(receiver.interface, ['rotate', 5])
+    receiver.rcv_callback = lambda msg, client_obj: None
+    msg = frame.encrypted.construct(
+        sender.encryptor_cache[receiver.interface],
+        sender.wrap_sender(frame.json.construct('hello')).content,
+    )
+    return lambda: router.recv(msg)
+
+def run(number=10000):
+    ejtp_logger = logging.getLogger('ejtp')
+    level = ejtp_logger.level
+    ejtp_logger.setLevel(logging.WARNING)
+    try:
+        results = [
+            measure('logger.debug lazy, disabled', bench_debug_lazy(), number),
+            measure('logger.debug eager repr, disabled', bench_debug_eager(), number),
+            measure('Router.recv, logging at WARNING', bench_router_recv(), number),
+        ]
+    finally:
+        ejtp_logger.setLevel(level)
+    logging.disable(logging.CRITICAL)
+    try:
+        results.append(
+            measure('Router.recv, logging disabled', bench_router_recv(), number))
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    report(run(number))
@@ -0,0 +1,97 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+'''
+    Routing benchmarks
+
+    Sends messages from ping to pong, which forwards each one on to done,
+    entirely in-process: first with all three clients on one Router, then
+    with each on its own Router, joined by loopback jacks. Neither touches
+    the network, so the results are steady enough to compare across runs.
+    Run with:
+
+        python -m ejtp.bench.routing [number]
+'''
+
+import sys
+
+from ejtp.bench.core import measure, report
+from ejtp.client import Client
+from ejtp.identity import Identity, IdentityCache
+from ejtp.router import Router
+
+NAMES = ('ping', 'pong', 'done')
+
+def locations(transport):
+    if transport == 'local':
+        return [['local', None, name] for name in NAMES]
+    return [['loopback', 'bench-' + name, name] for name in NAMES]
+
+def chain(transport):
+    '''
+    Set up ping, pong and done, returning (send, routers). Each call to
+    send delivers one message all the way to done, or raises
+    AssertionError.
+
+    >>> send, routers = chain('loopback')
+    >>> for i in range(3): send()
+    >>> for router in routers: router.stop_all()
+    '''
+    cache = IdentityCache()
+    for index, location in enumerate(locations(transport)):
+        cache.update_ident(Identity(location[2], ['rotate', 3 + index], location))
+
+    if transport == 'local':
+        routers = [Router()] * len(NAMES)
+    else:
+        routers = [Router() for name in NAMES]
+    ping, pong, done = [
+        Client(router, location, cache)
+        for router, location in zip(routers, locations(transport))
+    ]
+    received = [0]
+    def forward(msg, client_obj):
+        pong.write_json(done.interface, msg.unpack())
+    def count(msg, client_obj):
+        received[0] += 1
+    pong.rcv_callback = forward
+    done.rcv_callback = count
+
+    def send():
+        before = received[0]
+        ping.write_json(pong.interface, {'payload': 'x' * 16})
+        if received[0] != before + 1:
+            raise AssertionError("message was not delivered")
+    return send, set(routers)
+
+def run(number=200):
+    results = []
+    for transport, name in (
+            ('local', 'route ping > pong > done, 1 router'),
+            ('loopback', 'route ping > pong > done, 3 routers')):
+        send, routers = chain(transport)
+        try:
+            results.append(measure(name, send, number))
+        finally:
+            for router in routers:
+                router.stop_all()
+    return results
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    report(run(number))
@@ -0,0 +1,202 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+__doc__ = '''python -m ejtp.bench.scale
+
+Scalability benchmark. Spreads K clients across M routers (one local
+Router, or several joined by loopback jacks) and sends messages between
+random pairs of clients through onion routes of random length, for each K
+in --clients. Reports setup time, throughput and tail latency.
+
+Usage:
+    ejtp.bench.scale [options]
+    ejtp.bench.scale -h | --help
+
+Options:
+    -c, --clients LIST   Client counts to try [default: 10,100,1000,10000]
+    -r, --routers M      Routers to spread clients over [default: 10]
+    -H, --hops DIST      Relays per message, as N or N:weight,... [default: 0:4,1:3,2:2,3:1]
+    -n, --number N       Messages per client count [default: 1000]
+    -s, --seed SEED      Seed for choosing clients and routes [default: 0]
+    -h --help            Show this help message
+
+Each message is delivered before owrite returns, so its latency is the
+time spent in that call: layering, relaying and every lookup on the way.
+'''
+
+import sys
+import random
+
+from ejtp import metrics
+from ejtp.bench.core import measure, report
+from ejtp.client import Client
+from ejtp.identity import Identity, IdentityCache
+from ejtp.router import Router
+from ejtp.vendor.docopt import docopt
+
+def parse_hops(text):
+    '''
+    Parse a relay count distribution into a list of (relays, weight).
+
+    >>> parse_hops('2')
+    [(2, 1.0)]
+    >>> parse_hops('0:3,2:1')
+    [(0, 3.0), (2, 1.0)]
+    '''
+    distribution = []
+    for part in text.split(','):
+        hops, sep, weight = part.partition(':')
+        distribution.append((int(hops), float(weight or 1)))
+    return distribution
+
+def choose(rng, distribution):
+    total = sum(weight for hops, weight in distribution)
+    point = rng.random() * total
+    for hops, weight in distribution:
+        point -= weight
+        if point < 0:
+            break
+    return hops
+
+def percentile(values, p):
+    # values must be sorted
+    index = int(p / 100.0 * len(values) + 0.5) - 1
+    return values[max(0, min(len(values) - 1, index))]
+
+
+class Topology(object):
+    '''
+    Clients spread round-robin over routers. A single router uses local
+    addresses, several are joined by loopback jacks.
+
+    >>> topology = Topology(20, 3)
+    >>> len(topology.routers), len(topology.cache.all())
+    (3, 20)
+    >>> for i in range(5): topology.send(2)
+    >>> topology.received
+    5
+    >>> topology.close()
+    '''
+
+    def __init__(self, clients, routers=1, seed=0):
+        if routers > clients:
+            raise ValueError("More routers than clients")
+        self.rng = random.Random(seed)
+        self.routers = [Router() for i in range(routers)]
+        self.cache = IdentityCache()
+        self.clients = []
+        self.received = 0
+        for i in range(clients):
+            name = 'c%d' % i
+            if routers == 1:
+                location = ['local', None, name]
+            else:
+                location = ['loopback', 'scale-r%d' % (i % routers), name]
+            self.cache.update_ident(Identity(name, ['rotate', 1 + i % 255], location))
+            client = Client(self.routers[i % routers], location, self.cache)
+            client.rcv_callback = self.deliver
+            self.clients.append(client)
+
+    def deliver(self, msg, client_obj):
+        self.received += 1
+
+    def send(self, relays):
+        '''
+        Send one message between two random clients, via relays random
+        clients, and make sure it arrived.
+        '''
+        source, target = self.rng.sample(self.clients, 2)
+        hoplist = [c.interface for c in self.rng.sample(self.clients, relays)]
+        before = self.received
+        source.owrite_json(hoplist + [target.interface], {'from': source.interface[2]})
+        if self.received != before + 1:
+            raise AssertionError("message was not delivered")
+
+    def close(self):
+        for router in self.routers:
+            router.stop_all()
+
+def sweep(counts, routers, distribution, number, seed=0):
+    '''
+    Time number messages for each client count, returning a dict per count.
+    '''
+    results = []
+    for count in counts:
+        start = metrics.clock()
+        topology = Topology(count, min(routers, count), seed)
+        setup = metrics.clock() - start
+        try:
+            latencies = []
+            start = metrics.clock()
+            for i in range(number):
+                relays = min(choose(topology.rng, distribution), count)
+                sent = metrics.clock()
+                topology.send(relays)
+                latencies.append(metrics.clock() - sent)
+            seconds = metrics.clock() - start
+        finally:
+            topology.close()
+        latencies.sort()
+        results.append({
+            'clients': count,
+            'routers': len(topology.routers),
+            'setup': setup,
+            'msgs_per_sec': number / seconds,
+            'p50': percentile(latencies, 50),
+            'p99': percentile(latencies, 99),
+            'p999': percentile(latencies, 99.9),
+        })
+    return results
+
+def report_sweep(results):
+    print("%8s %8s %9s %10s %9s %9s %9s" % (
+        'clients', 'routers', 'setup s', 'msg/s', 'p50 ms', 'p99 ms', 'p999 ms'))
+    for result in results:
+        print("%8d %8d %9.2f %10.1f %9.3f %9.3f %9.3f" % (
+            result['clients'],
+            result['routers'],
+            result['setup'],
+            result['msgs_per_sec'],
+            1000 * result['p50'],
+            1000 * result['p99'],
+            1000 * result['p999'],
+        ))
+
+def run(number=100):
+    # Fixed topology, so the suite has something to compare across runs
+    distribution = parse_hops('0:4,1:3,2:2,3:1')
+    topology = Topology(1000, 10)
+    try:
+        send = lambda: topology.send(choose(topology.rng, distribution))
+        return [measure('scale 1000 clients, 10 routers, 0-3 relays', send, number)]
+    finally:
+        topology.close()
+
+def main(argv=None):
+    args = docopt(__doc__, sys.argv[1:] if argv is None else argv)
+    counts = [int(count) for count in args['--clients'].split(',')]
+    report_sweep(sweep(
+        counts,
+        int(args['--routers']),
+        parse_hops(args['--hops']),
+        int(args['--number']),
+        int(args['--seed']),
+    ))
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,15 @@ along with the Python EJTP library.  If not, see
 import logging
 logger = logging.getLogger(__name__)
 
+import heapq
+import threading
+import time
+
+try:
+    from concurrent.futures import Future, TimeoutError as RequestTimeout
+except ImportError: # Python 2 without the futures backport
+    Future = None
+
 from persei import RawData, RawDataDecorator, StringDecorator
 
 from ejtp.crypto.encryptor import make
@@ -26,10 +35,20 @@ from ejtp.util.hasher import strict, make as hashfunc
 
 from ejtp.address import *
 from ejtp import frame
+from ejtp import metrics
+from ejtp.trace import traced
 from ejtp import jacks
 from ejtp import identity
 
 class Client(object):
+    # Limits for bundling several JSON messages into a single frame
+    bundle_size   = 2048 # Max bytes of inner frames per bundle
+    bundle_window = 0.05 # Seconds a queued message may wait for company
+    # Seconds request_json waits for a response by default, None for ever
+    request_timeout = None
+    # Optional ejtp.dispatch.RateLimiter applied to each sender
+    rate_limiter = None
+
     def __init__(self, router, interface, encryptor_cache = None, make_jack = True):
         '''
             encryptor_get should be a function that accepts an argument "iface"
@@ -40,6 +59,14 @@ class Client(object):
         if hasattr(self.router, "_loadclient"):
             self.router._loadclient(self)
         self.encryptor_cache = encryptor_cache or identity.IdentityCache()
+        self._bundle_queue = {}
+        self._bundle_lock = threading.Lock()
+        self._bundle_generation = 0
+        self._requests = {} # (str sender, request id) -> Future
+        self._request_lock = threading.Condition()
+        self._request_count = 0
+        self._expiry = [] # (deadline, key) heap, serviced by _expiry_thread
+        self._expiry_thread = None
         if make_jack:
             jacks.make(router, interface)
 
@@ -54,28 +81,43 @@ class Client(object):
         '''
         self.send(msg)
 
+    @traced('route', 1)
     def route(self, msg):
         # Recieve frame from router (will be type 'r' or 's', which contains message)
-        logger.debug("Client routing frame: %s", repr(msg))
+        logger.debug("Client routing frame: %r", msg)
         if isinstance(msg, frame.address.ReceiverCategory):
             if msg.address != self.interface:
                 self.relay(msg)
             else:
                 self.route( msg.unpack(self.encryptor_cache) )
         elif isinstance(msg, frame.address.SenderCategory):
-            self.route( msg.unpack(self.encryptor_cache) )
-        elif isinstance(msg, frame.json.JSONFrame):
-            self.rcv_callback(msg, self)
+            # Unpacking verifies the signature, so a forged sender address
+            # can't use up the real sender's rate
+            inner = msg.unpack(self.encryptor_cache)
+            if self.rate_limiter and not self.rate_limiter.allow(msg.header.export()):
+                logger.debug("Sender over rate limit, dropping frame")
+                return
+            self.route(inner)
+        elif isinstance(msg, (frame.json.JSONFrame, frame.packed.PackedFrame)):
+            if not self._resolve(msg):
+                start = metrics.clock()
+                self.rcv_callback(msg, self)
+                metrics.observe('callback', metrics.clock() - start)
+        elif isinstance(msg, frame.bundle.BundleFrame):
+            for inner in msg.unpack(self.encryptor_cache):
+                self.route(inner)
         else:
             raise TypeError("Unknown frame type", msg)
 
     def rcv_callback(self, msg, client_obj):
-        logger.info("Client %r recieved from %r: %r", client_obj.interface, msg.sender, msg)
+        if logger.isEnabledFor(logging.INFO): # msg.sender walks the ancestors
+            logger.info("Client %r recieved from %r: %r", client_obj.interface, msg.sender, msg)
 
     def write(self, addr, txt, wrap_sender=True):
         # Write and send a frame to addr
         self.owrite([addr], txt, wrap_sender)
 
+    @traced('owrite', 2)
     def owrite(self, hoplist, msg, wrap_sender=True):
         # Write a frame and send through a list of addresses
         # The "o" is for onion routing
@@ -94,6 +136,185 @@ class Client(object):
     def write_json(self, addr, data, wrap_sender=True):
         self.owrite_json([addr], data, wrap_sender)
 
+    def owrite_packed(self, hoplist, data, wrap_sender=True):
+        msg = frame.packed.construct(data)
+        self.owrite(hoplist, msg, wrap_sender)
+
+    def write_packed(self, addr, data, wrap_sender=True):
+        self.owrite_packed([addr], data, wrap_sender)
+
+    def write_json_many(self, addr, datalist, wrap_sender=True):
+        '''
+        Send several JSON messages to addr, packed into as few bundle frames
+        as bundle_size allows, so each bundle is signed and encrypted once.
+        '''
+        contents = [frame.json.construct(data).content for data in datalist]
+        self._write_bundled(addr, contents, wrap_sender)
+
+    def queue_json(self, addr, data):
+        '''
+        Queue a JSON message for addr. Queued messages to the same address
+        are sent together by write_json_many once bundle_size is reached or
+        bundle_window seconds have passed, whichever comes first.
+        '''
+        key = str_address(addr)
+        content = frame.json.construct(data).content
+        with self._bundle_lock:
+            if key not in self._bundle_queue:
+                # The timer only flushes the batch it was started for
+                self._bundle_generation += 1
+                timer = threading.Timer(self.bundle_window, self._flush_batch,
+                    [key, self._bundle_generation])
+                timer.daemon = True
+                timer.start()
+                self._bundle_queue[key] = (py_address(addr), [], timer, self._bundle_generation)
+            contents = self._bundle_queue[key][1]
+            contents.append(content)
+            full = sum(len(c) for c in contents) >= self.bundle_size
+        if full:
+            self.flush_json(addr)
+
+    def flush_json(self, addr=None):
+        '''
+        Immediately send messages queued with queue_json, either for one
+        address or for all of them.
+        '''
+        with self._bundle_lock:
+            if addr is None:
+                pending = list(self._bundle_queue.values())
+                self._bundle_queue.clear()
+            else:
+                pending = [self._bundle_queue.pop(str_address(addr), None)]
+        for item in pending:
+            if item is None:
+                continue
+            target, contents, timer, generation = item
+            timer.cancel()
+            self._write_bundled(target, contents, True)
+
+    def _flush_batch(self, key, generation):
+        # Timer callback: flush the batch for key, unless it already went
+        with self._bundle_lock:
+            item = self._bundle_queue.get(key)
+            if item is None or item[3] != generation:
+                return
+            del self._bundle_queue[key]
+        self._write_bundled(item[0], item[1], True)
+
+    def _write_bundled(self, addr, contents, wrap_sender):
+        # Split frame contents into bundles that fit in bundle_size
+        groups = []
+        size = 0
+        for content in contents:
+            if not groups or size + len(content) > self.bundle_size:
+                groups.append([])
+                size = 0
+            groups[-1].append(content)
+            size += len(content)
+        for group in groups:
+            if len(group) == 1:
+                msg = frame.createFrame(group[0])
+            else:
+                msg = frame.bundle.construct(group)
+            self.owrite([addr], msg, wrap_sender)
+
+    def request_json(self, addr, data, timeout=None):
+        '''
+        Send a JSON request to addr, returning a concurrent.futures.Future
+        for the response frame. Any number of requests may be in flight to
+        the same peer, each matched to its response by a request id that
+        the peer echoes back with respond_json. Responses go to the future
+        instead of rcv_callback. Use asyncio.wrap_future to await it.
+
+        The future fails with concurrent.futures.TimeoutError if no response
+        arrives within timeout seconds (request_timeout by default). Once the
+        future is done, a late response goes to rcv_callback like any other
+        frame.
+        '''
+        if Future is None:
+            raise RuntimeError("request_json requires concurrent.futures")
+        if timeout is None:
+            timeout = self.request_timeout
+        future = Future()
+        with self._request_lock:
+            self._request_count += 1
+            request_id = self._request_count
+            key = (str_address(addr), request_id)
+            self._requests[key] = future
+            if timeout is not None:
+                self._schedule_expiry(time.time() + timeout, key)
+        future.add_done_callback(lambda f: self._requests.pop(key, None))
+
+        data = dict(data)
+        data['request_id'] = request_id
+        try:
+            self.write_json(addr, data)
+        except:
+            self._requests.pop(key, None)
+            future.cancel()
+            raise
+        return future
+
+    def respond_json(self, request, data):
+        '''
+        Send data to the sender of request, a frame received from
+        request_json, marked as the response to it.
+        '''
+        data = dict(data)
+        data['response_to'] = request.unpack()['request_id']
+        self.write_json(request.sender, data)
+
+    def _resolve(self, msg):
+        # Complete the pending request msg answers. False if there is none.
+        if not self._requests or b'response_to' not in msg.body.export():
+            # Can't be a response, so leave the unpacking to rcv_callback
+            return False
+        data = msg.unpack()
+        if not isinstance(data, dict) or 'response_to' not in data:
+            return False
+        try:
+            key = (str_address(msg.sender), data['response_to'])
+            future = self._requests.pop(key, None)
+        except TypeError: # Unhashable response_to, so not one of ours
+            return False
+        if future is None:
+            return False
+        if future.set_running_or_notify_cancel():
+            future.set_result(msg)
+        return True
+
+    def _schedule_expiry(self, deadline, key):
+        # Called with _request_lock held. One thread expires every request.
+        heapq.heappush(self._expiry, (deadline, key))
+        if self._expiry_thread is None:
+            self._expiry_thread = threading.Thread(target=self._run_expiry)
+            self._expiry_thread.daemon = True
+            self._expiry_thread.start()
+        elif self._expiry[0][1] == key:
+            # New earliest deadline
+            self._request_lock.notify()
+
+    def _run_expiry(self):
+        # Fail requests as their deadlines pass, until none are left
+        while True:
+            expired = []
+            with self._request_lock:
+                if not self._expiry:
+                    self._expiry_thread = None
+                    return
+                delay = self._expiry[0][0] - time.time()
+                if delay > 0:
+                    self._request_lock.wait(delay)
+                while self._expiry and self._expiry[0][0] <= time.time():
+                    deadline, key = heapq.heappop(self._expiry)
+                    future = self._requests.pop(key, None)
+                    if future is not None:
+                        expired.append((key, future))
+            # Outside the lock, as done callbacks may make new requests
+            for key, future in expired:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(RequestTimeout("No response to request %r" % (key,)))
+
     def wrap_sender(self, msg):
         # Encapsulate a message within a sender frame
         return frame.signed.construct(self.identity, msg.content)
@@ -46,5 +46,18 @@ def configure_identity_cache(cache, filenames=['~/.ejtp/idents.json', '~/.ejtp/c
         cache.load_from(filename)
     return filenames
 
+def configure_keypool(path=None, size=None, env_var='EJTP_KEYPOOL_PATH'):
+    '''
+    Enable the RSA key pool, keeping unused keys in path between runs.
+
+    The path in env_var, if set, takes precedence. Does nothing if there is
+    no path, or if the pool is already enabled. Returns the pool or None.
+    '''
+    from ejtp.crypto import keypool
+    path = os.environ.get(env_var) or path
+    if path and keypool.pool is None:
+        keypool.enable(size, path=path, bits=())
+    return keypool.pool
+
 def configure_ejtpd(filenames):
     raise NotImplementedError()
@@ -20,6 +20,7 @@ along with the Python EJTP library.  If not, see
 __all__ = [
 	'aes',
     'encryptor',
+    'keypool',
 	'rsa',
 	'rotate',
     'ecc'
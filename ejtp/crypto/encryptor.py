@@ -19,8 +19,6 @@ along with the Python EJTP library.  If not, see
 from persei import String, RawDataDecorator, StringDecorator
 
 from ejtp.util.hasher import strict
-from Crypto.Hash import SHA256 as hashclass
-import streql
 
 class Encryptor(object):
     def encrypt(self, s):
@@ -51,6 +49,9 @@ class Encryptor(object):
         '''
         Produces a Crypto.Hash object.
         '''
+        # Imported here, as Crypto is slow to import and not every
+        # process that imports ejtp.crypto ends up hashing anything
+        from Crypto.Hash import SHA256 as hashclass
         h = hashclass.new()
         h.update(plaintext.export())
         return h
@@ -76,6 +77,7 @@ class Encryptor(object):
         Verify a signature, by comparing it against a new signature
         of the same source data.
         '''
+        import streql
         return streql.equals(signature.export(), self.sign(plaintext).export())
 
     def flip(self):
@@ -0,0 +1,203 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+'''
+    RSA key pool
+
+    Generating an RSA key blocks for anything from a fraction of a second
+    to several seconds. A KeyPool keeps a few keys of each size ready,
+    generated ahead of time by worker processes, and can save unused keys
+    to a file so the next run starts with a full pool.
+
+    The pool is off until enabled, so by default RSA(None, bits) still
+    generates its own key:
+
+        from ejtp.crypto import keypool
+        keypool.enable(size=8, path='~/.ejtp/keypool.json')
+'''
+
+import os
+import json
+import atexit
+import threading
+import multiprocessing
+
+def generate(bits):
+    '''
+    Generate a key, returning it as PEM text so it can come back from a
+    worker process and be saved as JSON. Returns None if generation fails.
+    '''
+    from Crypto.PublicKey import RSA
+    try:
+        return RSA.generate(bits).exportKey().decode('ascii')
+    except Exception:
+        return None
+
+class KeyPool(object):
+    '''
+    Keys ready to use, by size in bits. take() hands out a pooled key when
+    there is one, generating on the spot otherwise, and tops the pool back
+    up in the background.
+    '''
+
+    size = 4 # Keys to keep ready per size
+    workers = None # Worker processes, default one per CPU
+
+    def __init__(self, size=None, workers=None, path=None):
+        if size is not None:
+            self.size = size
+        if workers is not None:
+            self.workers = workers
+        self.path = path and os.path.expanduser(path)
+        self.keys = {}
+        self.pending = {}
+        self._lock = threading.Condition()
+        self._pool = None
+        if self.path:
+            self.load()
+
+    def ready(self, bits=1024):
+        with self._lock:
+            return len(self.keys.get(bits, ()))
+
+    def take(self, bits=1024):
+        '''
+        Return a private key with the given number of bits, as PEM text.
+        '''
+        with self._lock:
+            keys = self.keys.get(bits)
+            key = keys.pop(0) if keys else None
+        self.fill(bits)
+        if key is None:
+            key = generate(bits)
+            if key is None:
+                raise ValueError("Could not generate key with %d bits." % bits)
+        return key
+
+    def fill(self, bits=1024):
+        '''
+        Start generating enough keys in the background to have size keys
+        with the given number of bits ready.
+        '''
+        with self._lock:
+            missing = self.size - len(self.keys.get(bits, ())) - self.pending.get(bits, 0)
+            if missing <= 0:
+                return
+            self.pending[bits] = self.pending.get(bits, 0) + missing
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.workers)
+            pool = self._pool
+        for i in range(missing):
+            pool.apply_async(generate, (bits,), callback=lambda key: self._add(bits, key))
+
+    def wait(self, bits=1024, timeout=None):
+        '''
+        Block until no keys with the given number of bits are pending.
+        '''
+        with self._lock:
+            while self.pending.get(bits):
+                if not self._lock.wait(timeout) and timeout is not None:
+                    break
+
+    def _add(self, bits, key):
+        with self._lock:
+            if not self.pending.get(bits):
+                # Finished after close() gave up on it
+                return
+            self.pending[bits] -= 1
+            if key is not None:
+                self.keys.setdefault(bits, []).append(key)
+            self._lock.notify_all()
+
+    def load(self):
+        '''
+        Take over the keys saved at path. The file is moved aside before
+        reading, so two processes never load the same keys.
+        '''
+        claimed = '%s.%d' % (self.path, os.getpid())
+        try:
+            os.rename(self.path, claimed)
+        except OSError:
+            return
+        try:
+            with open(claimed) as rfile:
+                saved = json.load(rfile)
+        finally:
+            os.remove(claimed)
+        with self._lock:
+            for bits, keys in saved.items():
+                self.keys.setdefault(int(bits), []).extend(keys)
+
+    def save(self):
+        '''
+        Write unused keys to path, readable only by the current user. Keys
+        that another process saved there in the meantime are kept.
+        '''
+        self.load()
+        with self._lock:
+            saved = dict((str(bits), keys) for (bits, keys) in self.keys.items() if keys)
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Another process may have made it first
+                if not os.path.isdir(directory):
+                    raise
+        temp = '%s.%d.tmp' % (self.path, os.getpid())
+        wfile = os.fdopen(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w')
+        with wfile:
+            json.dump(saved, wfile)
+        os.rename(temp, self.path)
+
+    def close(self):
+        '''
+        Stop generating keys, and save unused ones if there is a path.
+        '''
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self.pending.clear()
+            self._lock.notify_all()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if self.path:
+            self.save()
+
+# The pool RSA(None, bits) takes keys from, if any
+pool = None
+
+def enable(size=None, workers=None, path=None, bits=(1024,)):
+    '''
+    Set up the pool used for new RSA keys, and start filling it with keys
+    of each size in bits. Unused keys are saved to path at exit.
+    '''
+    global pool
+    disable()
+    pool = KeyPool(size, workers, path)
+    for b in bits:
+        pool.fill(b)
+    return pool
+
+def disable():
+    global pool
+    if pool is not None:
+        pool.close()
+        pool = None
+
+atexit.register(disable)
@@ -23,7 +23,7 @@ except ImportError: # in python3.x it's renamed to _thread
     import _thread as thread
 from persei import RawDataDecorator
 
-from ejtp.crypto import encryptor
+from ejtp.crypto import encryptor, keypool
 
 from   Crypto.PublicKey import RSA as rsalib
 from   Crypto.Cipher import PKCS1_OAEP as Cipher
@@ -132,7 +132,10 @@ class RSA(encryptor.Encryptor):
 
     def _generate(self, bits):
         try:
-            self.set_key(rsalib.generate(bits))
+            if keypool.pool is None:
+                self.set_key(rsalib.generate(bits))
+            else:
+                self.set_key(rsalib.importKey(keypool.pool.take(bits)))
         finally:
             self.genlock.release()
 
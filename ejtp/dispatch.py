@@ -0,0 +1,281 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+'''
+    Dispatcher
+
+    Pool of worker threads that handle inbound frames for a Router, so jack
+    threads only read from the network. Frames are spread across workers by
+    their header, the receiving address for routable frames, so frames for
+    the same client are always handled in the order they arrived.
+
+    Each worker has a bounded queue. When one is full, the policy decides
+    what happens: BLOCK makes the jack thread wait (leaving excess traffic
+    to back up in the kernel or the peer), DROP_NEWEST discards the
+    incoming frame, and DROP_OLDEST discards the longest waiting one.
+
+    The number of frames waiting can also be limited per jack and per
+    client, so that one busy source or destination can't fill the queues
+    for everyone else. The same policy applies to those limits: BLOCK
+    waits for that jack's or client's frames to be taken by a worker,
+    DROP_NEWEST discards the incoming frame, and DROP_OLDEST discards
+    that jack's or client's longest waiting frame.
+
+    RateLimiter is a per-peer token bucket, used by Client to turn away
+    frames from senders that exceed their rate once their signature has
+    been checked.
+'''
+
+import logging
+logger = logging.getLogger(__name__)
+
+import collections
+import threading
+import time
+
+try:
+    import Queue
+except ImportError:
+    import queue as Queue
+
+from ejtp.util.crashnicely import Guard
+
+BLOCK       = 'block'
+DROP_NEWEST = 'drop-newest'
+DROP_OLDEST = 'drop-oldest'
+
+class Dispatcher(object):
+    def __init__(self, handler, workers=4, queue_size=1024, policy=BLOCK,
+            jack_limit=None, client_limit=None):
+        '''
+        handler is called with each submitted frame, on a worker thread.
+        queue_size is the number of frames each worker may have waiting,
+        jack_limit and client_limit the number that may be waiting from
+        one jack or for one client.
+
+        >>> handled = []
+        >>> dispatcher = Dispatcher(handled.append, workers=2)
+        >>> for data in (b'r["local",null,"a"]\\x00one', b'r["local",null,"a"]\\x00two'):
+        ...     dispatcher.submit(data)
+        >>> dispatcher.stop()
+        >>> handled == [b'r["local",null,"a"]\\x00one', b'r["local",null,"a"]\\x00two']
+        True
+        '''
+        if policy not in (BLOCK, DROP_NEWEST, DROP_OLDEST):
+            raise ValueError("Unknown queue policy", policy)
+        self.handler = handler
+        self.policy  = policy
+        self.jack_limit   = jack_limit
+        self.client_limit = client_limit
+        self.drops = {'queue': 0, 'jack': 0, 'client': 0}
+        self._lock = threading.Condition()
+        self._pending = {} # key or jack -> deque of frames waiting
+        self._queues  = [Queue.Queue(queue_size) for i in range(workers)]
+        self._threads = []
+        for queue in self._queues:
+            thread = threading.Thread(target=self._work, args=(queue,))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def dropped(self):
+        return sum(self.drops.values())
+
+    def submit(self, data, source=None):
+        '''
+        Queue data from the jack source for handling, applying the limits
+        and the policy.
+        '''
+        # data, key, source, and whether it is still waiting to be handled
+        item = [data, key(data), source, True]
+        with self._lock:
+            for reason, counted, limit in (
+                    ('client', item[1], self.client_limit),
+                    ('jack', source, self.jack_limit)):
+                while counted is not None and self._over(counted, limit):
+                    if self.policy == DROP_NEWEST:
+                        return self._drop(reason)
+                    elif self.policy == DROP_OLDEST:
+                        self._cancel(self._pending[counted][0])
+                        self._drop(reason)
+                    else:
+                        self._lock.wait()
+            self._count(item, 1)
+        queue = self._queues[hash(item[1]) % len(self._queues)]
+        for dropped in put(queue, item, self.policy):
+            with self._lock:
+                if dropped[3]:
+                    self._cancel(dropped)
+                    self._drop('queue')
+
+    def join(self):
+        '''
+        Wait until every queued frame has been handled.
+        '''
+        for queue in self._queues:
+            queue.join()
+
+    def stop(self):
+        '''
+        Handle everything already queued, then stop the worker threads.
+        '''
+        for queue in self._queues:
+            queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _over(self, counted, limit):
+        return limit is not None and len(self._pending.get(counted, ())) >= limit
+
+    def _count(self, item, change):
+        data, frame_key, source, waiting = item
+        for counted in (frame_key, source):
+            if counted is None:
+                continue
+            if change > 0:
+                self._pending.setdefault(counted, collections.deque()).append(item)
+                continue
+            pending = self._pending[counted]
+            if pending[0] is item:
+                pending.popleft()
+            else:
+                pending.remove(item)
+            if not pending:
+                del self._pending[counted]
+
+    def _cancel(self, item):
+        # Stop counting item as waiting. Workers skip cancelled items.
+        item[3] = False
+        self._count(item, -1)
+        self._lock.notify_all()
+
+    def _drop(self, reason):
+        self.drops[reason] += 1
+        logger.debug("Dropped a frame (%s limit)", reason)
+
+    def _work(self, queue):
+        while True:
+            item = queue.get()
+            try:
+                if item is None:
+                    return
+                with self._lock:
+                    if not item[3]:
+                        continue
+                    self._cancel(item)
+                with Guard():
+                    self.handler(item[0])
+            finally:
+                queue.task_done()
+
+class RateLimiter(object):
+    def __init__(self, rate, burst=None, max_peers=4096):
+        '''
+        Token bucket per peer: each peer may send rate frames per second,
+        with bursts of up to burst frames. Buckets that have filled back up
+        are forgotten once more than max_peers are tracked.
+
+        >>> limiter = RateLimiter(1, burst=2)
+        >>> [limiter.allow('peer', now=0) for i in range(3)]
+        [True, True, False]
+        >>> limiter.allow('other', now=0), limiter.allow('peer', now=1)
+        (True, True)
+        >>> limiter.dropped
+        1
+        '''
+        self.rate  = float(rate)
+        self.burst = burst or rate
+        self.max_peers = max_peers
+        self.dropped = 0
+        self._buckets = {} # peer -> [tokens, time of last update]
+        self._lock = threading.Lock()
+
+    def allow(self, peer, now=None):
+        '''
+        Take a token from peer's bucket. Returns False if it is empty.
+        '''
+        if now is None:
+            now = time.time()
+        with self._lock:
+            bucket = self._buckets.get(peer)
+            if bucket is None:
+                if len(self._buckets) >= self.max_peers:
+                    self._prune(now)
+                bucket = self._buckets[peer] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            self.dropped += 1
+            return False
+
+    def _prune(self, now):
+        for peer, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.burst:
+                del self._buckets[peer]
+
+def put(queue, item, policy):
+    '''
+    Put item on a bounded queue.Queue according to policy, returning the
+    items dropped to do so. The None that stops a worker is never dropped:
+    with it at the head of the queue, DROP_OLDEST drops item instead.
+
+    >>> q = Queue.Queue(1)
+    >>> put(q, 'a', DROP_OLDEST), put(q, 'b', DROP_OLDEST), put(q, 'c', DROP_NEWEST)
+    ([], ['a'], ['c'])
+    '''
+    if policy == BLOCK:
+        queue.put(item)
+        return []
+    dropped = []
+    while True:
+        try:
+            queue.put_nowait(item)
+            return dropped
+        except Queue.Full:
+            pass
+        if policy == DROP_NEWEST:
+            return [item]
+        try:
+            oldest = queue.get_nowait()
+        except Queue.Empty:
+            continue
+        queue.task_done()
+        if oldest is None:
+            # Stopping, so the worker won't get to item anyway
+            queue.put(None)
+            dropped.append(item)
+            return dropped
+        dropped.append(oldest)
+
+def key(data):
+    '''
+    Ordering key of raw frame data: its type byte and header.
+
+    >>> key(b'r["local",null,"a"]\\x00payload') == b'r["local",null,"a"]'
+    True
+    '''
+    if isinstance(data, bytes):
+        end = data.find(b'\x00')
+        if end >= 0:
+            return data[:end]
+    return data
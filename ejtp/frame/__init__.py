@@ -18,12 +18,16 @@ along with the Python EJTP library.  If not, see
 
 __all__ = [
     'createFrame',
+    'createFrameFromBytes',
     'RegisterFrame',
+    'registerLazy',
     'address',
     'base',
+    'bundle',
     'encrypted',
     'signed',
     'json',
+    'packed',
     'compressed',
     'registration',
 ]
@@ -31,24 +35,46 @@ __all__ = [
 __doctestall__ = [
     'address',
     'base',
+    'bundle',
     'encrypted',
     'signed',
     'json',
+    'packed',
     'registration',
 ]
 
-from ejtp.frame.registration import createFrame, RegisterFrame
+import sys
 
-# importing all builtin Frames to make them register themselves
-_builtin_frames = ('ejtp.frame.encrypted', 'ejtp.frame.signed', 'ejtp.frame.json', 'ejtp.frame.compressed')
+from ejtp.frame.registration import createFrame, createFrameFromBytes, RegisterFrame, registerLazy
+from ejtp.util.compat import import_module
+
+# Builtin frame types, imported the first time a frame of that type is
+# created (or the module is used), so importing ejtp.frame stays cheap
+_builtin_frames = (
+    ('r', 'ejtp.frame.encrypted', 'EncryptedFrame'),
+    ('s', 'ejtp.frame.signed', 'SignedFrame'),
+    ('j', 'ejtp.frame.json', 'JSONFrame'),
+    ('c', 'ejtp.frame.compressed', 'CompressedFrame'),
+    ('m', 'ejtp.frame.bundle', 'BundleFrame'),
+    ('p', 'ejtp.frame.packed', 'PackedFrame'),
+)
+
+for char, module, name in _builtin_frames:
+    registerLazy(char, module, name)
 
 def init():
-    try:
-        from importlib import import_module
-    except ImportError:
-        import_module = __import__
+    '''
+    Import every builtin frame module now, rather than on first use.
+    '''
+    for char, module, name in _builtin_frames:
+        import_module(module)
 
-    for f in _builtin_frames:
-        import_module(f)
+def __getattr__(name):
+    # Submodules like ejtp.frame.json are imported on first access
+    if name in __all__:
+        return import_module(__name__ + '.' + name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
-init()
+if sys.version_info < (3, 7):
+    # No module __getattr__, so submodules must be imported up front
+    init()
@@ -18,6 +18,8 @@ along with the Python EJTP library.  If not, see
 
 from persei import RawData, String, RawDataDecorator, StringDecorator
 
+from ejtp.trace import traced
+
 json = __import__('json', {})
 
 class BaseFrame(object):
@@ -30,10 +32,12 @@ class BaseFrame(object):
     [B, A]
     '''
 
-    @RawDataDecorator()
     def __init__(self, data, ancestors = None):
         if not isinstance(data, RawData):
-            raise TypeError('data must be of type RawData') 
+            try:
+                data = RawData(data)
+            except (TypeError, ValueError):
+                raise TypeError('data must be of type RawData')
         self._content = data
         self._ancestors = []
         if ancestors is not None:
@@ -59,6 +63,7 @@ class BaseFrame(object):
         '''
         raise NotImplementedError('Each subclass of BaseFrame must implement decode')
    
+    @traced('unpack')
     def unpack(self, ident_cache = None):
         '''
         Returns a Frame or json-parsed object decoded from the content.
@@ -0,0 +1,74 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+
+__all__ = ['BundleFrame', 'construct']
+
+import struct
+
+from persei import RawData
+
+from ejtp.frame.base import BaseFrame
+from ejtp.frame.registration import RegisterFrame, createFrameFromBytes
+
+_length = struct.Struct('>I')
+
+@RegisterFrame('m')
+class BundleFrame(BaseFrame):
+    '''
+    Carries several inner frames, each prefixed by its length as a 4-byte
+    big-endian integer. Wrapping a bundle in a single signed or encrypted
+    frame amortizes the crypto cost across every message inside it.
+
+    >>> bundle = construct(['j\\x00"a"', 'j\\x00"b"'])
+    >>> [f.unpack() for f in bundle.unpack()] == ['a', 'b']
+    True
+    '''
+
+    def decode(self, ident_cache = None):
+        '''
+        Returns a list of bytes, one for each inner frame.
+        '''
+        body = self.body.export()
+        frames = []
+        offset = 0
+        while offset < len(body):
+            if offset + _length.size > len(body):
+                raise ValueError('truncated bundle')
+            size, = _length.unpack_from(body, offset)
+            offset += _length.size
+            if offset + size > len(body):
+                raise ValueError('truncated bundle')
+            frames.append(body[offset:offset+size])
+            offset += size
+        return frames
+
+    def unpack(self, ident_cache = None):
+        '''
+        Returns a list of the inner frames.
+        '''
+        ancestors = [self.crop()] + self._ancestors
+        return [createFrameFromBytes(data, ancestors) for data in self.decode(ident_cache)]
+
+def construct(contents):
+    parts = [b'm\x00']
+    for content in contents:
+        content = RawData(content).export()
+        parts.append(_length.pack(len(content)))
+        parts.append(content)
+    return BundleFrame(b''.join(parts))
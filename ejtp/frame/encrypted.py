@@ -18,6 +18,8 @@ along with the Python EJTP library.  If not, see
 
 from persei import RawData, RawDataDecorator
 
+from ejtp import metrics
+from ejtp.trace import traced
 from ejtp.address import str_address
 from ejtp.frame.base import BaseFrame
 from ejtp.frame.registration import RegisterFrame
@@ -25,13 +27,22 @@ from ejtp.frame.address import ReceiverCategory
 
 @RegisterFrame('r')
 class EncryptedFrame(ReceiverCategory, BaseFrame):
+    @traced('decrypt')
     @RawDataDecorator(args=False, ret=True, strict=True)
     def decode(self, ident_cache):
+        start = metrics.clock()
         try:
             ident = ident_cache[self.address]
         except (KeyError, TypeError):
+            metrics.incr('decrypt_errors')
             raise ValueError('could not load Identity from ident_cache')
-        return ident.decrypt(self.body)
+        try:
+            plaintext = ident.decrypt(self.body)
+        except Exception:
+            metrics.incr('decrypt_errors')
+            raise
+        metrics.observe('decrypt', metrics.clock() - start)
+        return plaintext
 
 def construct(identity, content):
     return EncryptedFrame(
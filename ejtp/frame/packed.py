@@ -0,0 +1,49 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+
+__all__ = ['PackedFrame', 'construct']
+
+from ejtp.frame.base import BaseFrame
+from ejtp.frame.registration import RegisterFrame
+from ejtp.util import compact
+
+@RegisterFrame('p')
+class PackedFrame(BaseFrame):
+    '''
+    Like JSONFrame, but the body is in the compact binary encoding from
+    ejtp.util.compact, so bytes values travel without inflation.
+
+    >>> construct({'data': b'\\x00\\x01'}).unpack() == {'data': b'\\x00\\x01'}
+    True
+    '''
+
+    def decode(self, ident_cache = None):
+        '''
+        Returns the packed body as RawData.
+        '''
+        return self.body
+
+    def unpack(self, ident_cache = None):
+        '''
+        Returns the object deserialized from the body.
+        '''
+        return compact.unpack(self.body)
+
+def construct(content):
+    return PackedFrame(b'p\x00' + compact.pack(content))
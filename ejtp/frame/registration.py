@@ -16,32 +16,94 @@ along with the Python EJTP library.  If not, see
 <http://www.gnu.org/licenses/>.
 '''
 
-__all__ = ['createFrame', 'RegisterFrame']
+__all__ = ['createFrame', 'createFrameFromBytes', 'RegisterFrame', 'registerLazy', 'frameClass']
 __doctestall__ = []
 
 from persei import RawData, RawDataDecorator
 
 from ejtp.frame.base import BaseFrame
+from ejtp.util.compat import is_py3k, import_module
+from ejtp.trace import traced
 
 # contains all types of frames known to ejtp
 # keys are RawData of length 1
 # values are subclasses from ejtp.frame.base.BaseFrame
 _frametypes = {}
 
-@RawDataDecorator()
+# same registry as _frametypes, indexed by the integer value of the type byte
+# so that parsing a frame costs one list index instead of a RawData hash
+_dispatch = [None] * 256
+
+# frame classes that are registered but not imported yet, indexed by the
+# integer value of the type byte, as (module name, class name)
+_lazy = {}
+
+def registerLazy(char, module, name):
+    '''
+    Register the frame class module.name for type byte char, without
+    importing module until a frame of that type is created.
+
+    >>> registerLazy('z', 'ejtp.frame.json', 'JSONFrame')
+    >>> frameClass(ord('z'))
+    <class 'ejtp.frame.json.JSONFrame'>
+    >>> del _lazy[ord('z')]; _dispatch[ord('z')] = None
+    '''
+    char = RawData(char)
+    if len(char) != 1:
+        raise ValueError('char must be of length 1')
+    _lazy[int(char)] = (module, name)
+
+def frameClass(byte):
+    '''
+    Return the frame class for the integer type byte, or None. Lazily
+    registered classes are imported and registered on first use.
+    '''
+    cls = _dispatch[byte]
+    if cls is None and byte in _lazy:
+        module, name = _lazy[byte]
+        cls = getattr(import_module(module), name)
+        _frametypes[RawData(byte)] = cls
+        _dispatch[byte] = cls
+    return cls
+
+@traced('createFrame')
 def createFrame(data, ancestors = None):
     '''
     Returns subclass of BaseFrame represented by data[0] or throws
-    NotImplementedError if char is not registered.
+    ValueError if char is not registered.
     '''
-    
+    if isinstance(data, bytes):
+        return createFrameFromBytes(data, ancestors)
     if not isinstance(data, RawData):
-        raise TypeError('data must be of type RawData')
-    cls = _frametypes.get(data[0])
+        try:
+            data = RawData(data)
+        except (TypeError, ValueError):
+            raise TypeError('data must be of type RawData')
+    byte = next(iter(data), None)
+    if byte is None:
+        raise ValueError('can not create frame from empty data')
+    cls = _dispatch[byte] or frameClass(byte)
     if cls is None:
         raise ValueError('%s is not registered' % data[0])
     return cls(data, ancestors)
 
+def createFrameFromBytes(data, ancestors = None):
+    '''
+    Fast path of createFrame for raw bytes as read from a socket.
+
+    >>> createFrameFromBytes(b'j\\x00"hello"')
+    JSONFrame: RawData((0x6a,0x0,0x22,0x68,0x65,0x6c,0x6c,0x6f,0x22))
+    '''
+    if not data:
+        raise ValueError('can not create frame from empty data')
+    byte = data[0]
+    if not is_py3k:
+        byte = ord(byte)
+    cls = _dispatch[byte] or frameClass(byte)
+    if cls is None:
+        raise ValueError('%s is not registered' % RawData(data[:1]))
+    return cls(data, ancestors)
+
 class RegisterFrame(object):
     '''
     This class is used as a decorator for subclasses of BaseFrame
@@ -76,8 +138,13 @@ class RegisterFrame(object):
 
         if not issubclass(cls, BaseFrame):
             raise TypeError('class must be subclass of BaseFrame')
+
+        lazy = _lazy.get(int(self._char))
+        if lazy and lazy != (cls.__module__, cls.__name__):
+            raise ValueError('char %s is already registered' % self._char)
         
         if self._char not in _frametypes:
             _frametypes[self._char] = cls
+            _dispatch[int(self._char)] = cls
         
         return cls
@@ -18,6 +18,8 @@ along with the Python EJTP library.  If not, see
 
 from persei import RawData, RawDataDecorator
 
+from ejtp import metrics
+from ejtp.trace import traced
 from ejtp.address import str_address
 from ejtp.frame.base import BaseFrame
 from ejtp.frame.registration import RegisterFrame
@@ -25,17 +27,22 @@ from ejtp.frame.address import SenderCategory
 
 @RegisterFrame('s')
 class SignedFrame(SenderCategory, BaseFrame):
+    @traced('verify')
     @RawDataDecorator(args=False, ret=True, strict=True)
     def decode(self, ident_cache):
+        start = metrics.clock()
         try:
             ident = ident_cache[self.address]
         except (KeyError, TypeError):
+            metrics.incr('verify_errors')
             raise ValueError('could not load Identity from ident_cache')
         body = self.body
         sigsize = int(body[0]) * 256 + int(body[1])
         content = body[sigsize+2:]
         if not ident.verify_signature(body[2:sigsize+2], content):
+            metrics.incr('verify_errors')
             raise ValueError('Invalid signature')
+        metrics.observe('verify', metrics.clock() - start)
         return content
 
 def construct(identity, content):
@@ -20,6 +20,7 @@ from ejtp.jacks.core import *
 
 __all__ = [
     'core',
+    'loopback',
     'stream',
     'tcp',
     'udp',
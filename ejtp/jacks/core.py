@@ -25,6 +25,9 @@ along with the Python EJTP library.  If not, see
 '''
 import threading
 
+from ejtp import metrics
+from ejtp.trace import traced
+
 class Jack(object):
     def __init__(self, router, interface):
         self.lock_init  = threading.Lock() # Acquirable if init is finished and ready to run
@@ -49,9 +52,19 @@ class Jack(object):
         # Send a message.Message from the router (assumes full flush)
         raise NotImplementedError("Subclasses of Jack must define route")
 
+    @traced('jack_send', 2)
+    def route_raw(self, address, data):
+        # Send raw frame bytes to address, without a parsed frame.
+        # Subclasses should override this to skip parsing entirely.
+        from ejtp.frame import createFrame
+        self.route(createFrame(data))
+
+    @traced('jack_recv', 1)
     def recv(self, data):
         # Send a string to the router (must be complete message)
-        self.router.recv(data)
+        metrics.incr('frames_in.' + self.ifacetype)
+        metrics.incr('bytes_in.' + self.ifacetype, len(data))
+        self.router.accept(data, self)
 
     def run_threaded(self):
         if hasattr(self, "closed") and self.closed==False:
@@ -68,11 +81,11 @@ class Jack(object):
         return self.interface[0]
 
 def make(router, iface):
-    if router:
+    t = iface[0]
+    if router and t != "loopback":
         existing_jack = router.jack(iface)
         if existing_jack:
             return existing_jack
-    t = iface[0]
     # UDP Jack
     if t == "udp":
         from ejtp.jacks import udp
@@ -93,6 +106,15 @@ def make(router, iface):
         host, port = iface[1]
         return tcp.TCPJack(router, host=host, port=port, ipv=4)
 
+    # In-process loopback Jack
+    elif t == "loopback":
+        from ejtp.jacks import loopback
+        # One jack per endpoint, rather than per router
+        existing_jack = loopback.endpoints.get(iface[1])
+        if existing_jack and existing_jack.router is router:
+            return existing_jack
+        return loopback.LoopbackJack(router, iface[1])
+
     # Local, no jack
     elif t == "local":
         return None
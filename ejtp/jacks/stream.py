@@ -18,7 +18,10 @@ along with the Python EJTP library.  If not, see
 
 from persei import RawData, RawDataDecorator
 
+from ejtp import metrics
+from ejtp.trace import traced
 from ejtp.jacks import core as jack
+from ejtp.dispatch import put, DROP_OLDEST
 
 import threading
 try:
@@ -77,19 +80,34 @@ class StreamJack(jack.Jack):
         '''
         Send frame to somewhere.
         '''
-        conn = self.get_connection(frame.address)
-        conn.send(frame)
+        self.route_raw(frame.address, frame.content)
+
+    @traced('jack_send', 2)
+    def route_raw(self, address, data):
+        '''
+        Send raw frame bytes to somewhere.
+        '''
+        conn = self.get_connection(address)
+        conn.send_data(data)
+        metrics.incr('frames_out.' + self.ifacetype)
+        metrics.incr('bytes_out.' + self.ifacetype, len(data))
 
 class Connection(object):
     '''
     Represents a persistent connection to a remote host. Should be subclassed.
     '''
+    # Frames kept for recv() when there is no jack, and what to do when full
+    queue_size   = 1024
+    queue_policy = DROP_OLDEST
+
     def __init__(self, jack=None):
         self.jack = jack
         self._buffer = RawData()
         self._running = False
-        self._outqueue = Queue.Queue()
+        self._outqueue = Queue.Queue(self.queue_size)
+        self.dropped = 0
         self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True # Like jack threads, don't hold up exit
 
     # SUBCLASS INTERFACE ------------------------------------------------------
 
@@ -123,7 +141,10 @@ class Connection(object):
         self._running = False
 
     def send(self, frame):
-        self._send(self.wrap(frame.content))
+        self.send_data(frame.content)
+
+    def send_data(self, data):
+        self._send(self.wrap(data))
 
     def recv(self, timeout=0):
         '''
@@ -148,14 +169,14 @@ class Connection(object):
         Process new data from the outside world.
         '''
         self._buffer += newdata
-        if RawData(".") not in self._buffer:
-            return
-        size, content = self._buffer.split('.',1)
-        size = int(size.export(), 16) # Read size as hex
-        if len(content) < size:
-            return
-        if self.jack:
-            self.jack.recv(content[:size])
-        else:
-            self._outqueue.put(content[:size])
-        self._buffer = content[size:]
+        # A single read may hold several frames
+        while RawData(".") in self._buffer:
+            size, content = self._buffer.split('.',1)
+            size = int(size.export(), 16) # Read size as hex
+            if len(content) < size:
+                return
+            if self.jack:
+                self.jack.recv(content[:size].export())
+            else:
+                self.dropped += len(put(self._outqueue, content[:size], self.queue_policy))
+            self._buffer = content[size:]
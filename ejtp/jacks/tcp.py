@@ -114,12 +114,13 @@ class TCPConnection(stream.Connection):
     @RawDataDecorator(strict=True)
     def _send(self, frame):
         sent = self.connection.send(frame.export())
-        logger.info("%d / %d %r -> %r", 
-            sent, 
-            len(frame), 
-            self.connection.getsockname(), 
-            self.connection.getpeername()
-        )
+        if logger.isEnabledFor(logging.DEBUG): # Spare the syscalls otherwise
+            logger.debug("%d / %d %r -> %r", 
+                sent, 
+                len(frame), 
+                self.connection.getsockname(), 
+                self.connection.getpeername()
+            )
 
     @RawDataDecorator(args=False, ret=True, strict=True)
     def _recv(self):
@@ -29,6 +29,8 @@ logger = logging.getLogger(__name__)
 
 from persei import RawDataDecorator
 
+from ejtp import metrics
+from ejtp.trace import traced
 from ejtp.jacks import core as jack
 
 class UDPJack(jack.Jack):
@@ -51,18 +53,23 @@ class UDPJack(jack.Jack):
 
     def route(self, msg):
         # Send frame to somewhere
+        self.route_raw(msg.address, msg.content.export())
+
+    @traced('jack_send', 2)
+    def route_raw(self, address, data):
+        # Send raw frame bytes to somewhere
         with self.lock_ready: pass # Make sure socket is ready
-        address = msg.address
         location = address[1]
         if self.ifacetype == 'udp':
             address = (location[0], location[1], 0,0)
         else:
             address = (location[0], location[1])
-        msg = msg.content
-        sent = self.sock.sendto(msg.export(), address)
-        logger.info("%d / %d %r -> %r", 
+        sent = self.sock.sendto(data, address)
+        metrics.incr('frames_out.' + self.ifacetype)
+        metrics.incr('bytes_out.' + self.ifacetype, sent)
+        logger.debug("%d / %d %r -> %r", 
             sent, 
-            len(msg), 
+            len(data), 
             self.address,
             address,
         )
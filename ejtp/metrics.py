@@ -0,0 +1,154 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+'''
+    Metrics
+
+    Process-wide counters and latency histograms for the frame pipeline.
+    The router, jacks, frames and clients record into the default registry
+    through the module functions; call snapshot() to read everything.
+
+    Counters:
+        frames_in.<jack type>, bytes_in.<jack type>    Received by jacks
+        frames_out.<jack type>, bytes_out.<jack type>  Sent by jacks
+        parse_errors     Data the router could not parse into a frame
+        undeliverable    Frames with no client or jack to go to
+        unknown_type     Frames the router does not know how to route
+        decrypt_errors   Encrypted frames that failed to decrypt
+        verify_errors    Signed frames with a missing or bad signature
+
+    Histograms (seconds): parse, decrypt, verify, callback
+'''
+
+import threading
+import time
+
+# Highest resolution clock available
+clock = getattr(time, 'perf_counter', time.time)
+
+class Histogram(object):
+    '''
+    Latency histogram with power-of-two microsecond buckets, so recording
+    a value is a few integer operations and memory use is fixed.
+
+    >>> h = Histogram()
+    >>> for usec in (1, 2, 3, 100, 5000):
+    ...     h.observe(usec / 1000000.0)
+    >>> h.count, h.percentile(50), h.percentile(99)
+    (5, 4e-06, 0.008192)
+    '''
+    buckets = 32 # Bucket n holds values under 2**n microseconds
+
+    def __init__(self):
+        self.counts = [0] * self.buckets
+        self.count = 0
+        self.total = 0.0
+        self.max   = 0.0
+
+    def observe(self, seconds):
+        index = int(seconds * 1000000).bit_length()
+        if index >= self.buckets:
+            index = self.buckets - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        '''
+        Upper bound of the bucket holding the pth percentile, in seconds.
+        '''
+        if not self.count:
+            return 0.0
+        rank = self.count * p / 100.0
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return (2 ** index) / 1000000.0
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean' : self.count and self.total / self.count,
+            'max'  : self.max,
+            'p50'  : self.percentile(50),
+            'p90'  : self.percentile(90),
+            'p99'  : self.percentile(99),
+        }
+
+class Registry(object):
+    '''
+    Named counters and histograms, safe to update from any thread.
+
+    >>> registry = Registry()
+    >>> registry.incr('parse_errors')
+    >>> registry.observe('parse', 0.000003)
+    >>> snap = registry.snapshot()
+    >>> snap['counters']
+    {'parse_errors': 1}
+    >>> snap['histograms']['parse']['count']
+    1
+    '''
+    def __init__(self):
+        self.counters   = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        '''
+        Return a copy of all counters, and a summary of each histogram.
+        '''
+        with self._lock:
+            return {
+                'counters'  : dict(self.counters),
+                'histograms': dict((name, h.snapshot())
+                    for (name, h) in self.histograms.items()),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+registry = Registry()
+
+def incr(name, n=1):
+    registry.incr(name, n)
+
+def observe(name, seconds):
+    registry.observe(name, seconds)
+
+def snapshot():
+    return registry.snapshot()
+
+def reset():
+    registry.reset()
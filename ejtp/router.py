@@ -28,16 +28,25 @@ import logging
 logger = logging.getLogger(__name__)
 
 from ejtp import frame
+from ejtp import metrics
+from ejtp.address import py_address
+from ejtp.util.compat import is_py3k
 from ejtp.util.crashnicely import Guard
+from ejtp.dispatch import Dispatcher, BLOCK
 
 STOPPED = 0
 THREADED = 1
 
+# Upper bound on remembered relay routes, since headers come off the wire
+RELAY_CACHE_SIZE = 4096
+
 class Router(object):
     def __init__(self, jacks=[], clients=[]):
         self.runstate = STOPPED
         self._jacks = {}
         self._clients = {}
+        self._relay_routes = {}
+        self.dispatcher = None
         self._loadjacks(jacks)
         self._loadclients(clients)
         self.run()
@@ -48,25 +57,109 @@ class Router(object):
 
         In the future, we may want to consider non-frames a ValueError
         '''
-        logger.debug("Handling frame: %s", repr(msg))
+        logger.debug("Handling frame: %r", msg)
         if not isinstance(msg, frame.base.BaseFrame):
+            if isinstance(msg, bytes) and self._relay(msg):
+                return
+            start = metrics.clock()
             try:
                 msg = frame.createFrame(msg)
             except Exception:
-                logger.info("Router could not parse frame: %s", repr(msg))
+                metrics.incr('parse_errors')
+                logger.info("Router could not parse frame: %r", msg)
                 return
+            metrics.observe('parse', metrics.clock() - start)
         if isinstance(msg, frame.address.ReceiverCategory):
-            recvr = self.client(msg.address) or self.jack(msg.address)
+            address = msg.address
+            recvr = self.client(address) or self.jack(address)
             if recvr:
                 with Guard():
                     recvr.route(msg)
             else:
-                logger.info("Router could not deliver frame: %s", str(msg.address))
+                metrics.incr('undeliverable')
+                logger.info("Router could not deliver frame: %s", address)
         elif isinstance(msg, frame.address.SenderCategory):
-            logger.info("Frame recieved directly from %s", str(msg.address))
+            metrics.incr('undeliverable')
+            logger.info("Frame recieved directly from %s", msg.address)
         else:
+            metrics.incr('unknown_type')
             logger.info("Frame has a type that the router does not understand (%r)", msg)
 
+    def accept(self, data, jack=None):
+        '''
+        Take inbound data from a jack. Handled immediately on the jack's
+        thread, unless a dispatcher has been started with dispatch().
+        '''
+        if self.dispatcher:
+            self.dispatcher.submit(data, jack)
+        else:
+            self.recv(data)
+
+    def dispatch(self, workers=4, queue_size=1024, policy=BLOCK, jack_limit=None, client_limit=None):
+        '''
+        Handle inbound frames on a pool of worker threads, keeping frames
+        for each client in order. See ejtp.dispatch for the queue policies
+        and limits. Frames dropped are counted in self.dispatcher.drops.
+
+        >>> from ejtp.dispatch import DROP_OLDEST
+        >>> r = Router()
+        >>> r.dispatch(workers=2, policy=DROP_OLDEST)
+        >>> r.accept(b'r["local",null,"nobody"]\\x00')
+        >>> r.run(STOPPED)
+        >>> r.dispatcher is None
+        True
+        '''
+        if self.dispatcher:
+            self.dispatcher.stop()
+        self.dispatcher = Dispatcher(self.recv, workers, queue_size, policy,
+            jack_limit, client_limit)
+
+    def _relay(self, data):
+        '''
+        Forward raw data addressed to a jack without parsing it into a frame.
+
+        Only the type byte and the header are inspected, and the header bytes
+        are used directly as the route cache key. Returns False if the data
+        must go through full frame parsing instead (local clients, unknown
+        destinations, malformed data).
+        '''
+        if not data:
+            return False
+        byte = data[0] if is_py3k else ord(data[0])
+        cls = frame.registration._dispatch[byte] or frame.registration.frameClass(byte)
+        if cls is None or not issubclass(cls, frame.address.ReceiverCategory):
+            return False
+        end = data.find(b'\x00')
+        if end < 0:
+            return False
+        header = data[1:end]
+        try:
+            route = self._relay_routes[header]
+        except KeyError:
+            route = self._relay_route(header)
+            if len(self._relay_routes) >= RELAY_CACHE_SIZE:
+                self._relay_routes.clear()
+            self._relay_routes[header] = route
+        if route is None:
+            return False
+        jack, addr = route
+        with Guard():
+            jack.route_raw(addr, data)
+        return True
+
+    def _relay_route(self, header):
+        # Return (jack, address) for a header that can be relayed, or None
+        try:
+            addr = py_address(header)
+        except Exception:
+            return None
+        if not isinstance(addr, list) or not addr or self.client(addr):
+            return None
+        jack = self.jack(addr)
+        if jack is None:
+            return None
+        return (jack, addr)
+
     def jack(self, addr):
         # Return jack registered at addr, or None
         for (t, l) in self._jacks:
@@ -85,6 +178,7 @@ class Router(object):
     def kill_client(self, addr):
         addr = rtuple(addr[:3])
         del self._clients[addr] # Bubble exception up if client does not exist
+        self._relay_routes.clear()
 
     def thread_all(self):
         # Run all Jack threads
@@ -95,6 +189,9 @@ class Router(object):
         # Run all Jack threads
         for i in self._jacks:
             self._jacks[i].close()
+        if self.dispatcher:
+            self.dispatcher.stop()
+            self.dispatcher = None
 
     def run(self, level=THREADED):
         if level==THREADED:
@@ -118,6 +215,7 @@ class Router(object):
         if key in self._jacks:
             raise ValueError('jack already loaded')
         self._jacks[key] = jack
+        self._relay_routes.clear()
         if self.runstate == THREADED:
             jack.run_threaded()
 
@@ -126,6 +224,7 @@ class Router(object):
         if key in self._clients:
             raise ValueError('client already loaded')
         self._clients[key] = client
+        self._relay_routes.clear()
 
 def rtuple(obj):
     # Convert lists into tuples recursively
@@ -1,8 +1,21 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
 from persei import String
 
 from ejtp.router import Router
 from ejtp.applications.ejforward.client import ForwardClient, logger as client_logger
 from ejtp.applications.ejforward.server import ForwardServer, logger as server_logger
+from ejtp.applications.ejforward.logstore import LogStorage
+from ejtp.applications.ejforward.sharded import ShardedForwardServer
+from ejtp.client import Client
+from ejtp.frame import createFrame
+from ejtp.frame.json import JSONFrame
+from ejtp.frame.packed import PackedFrame
+from ejtp.util.compat import unittest
 from ejtp.util.hasher import strict
 
 from ejtp.tests.tools import TestCaseWithLog
@@ -52,3 +65,407 @@ class TestClient(TestCaseWithLog):
     def test_upload(self):
         self.client.upload("farfagnugen", {})
         self.assertInLog("WARNING:ejtp.applications.ejforward.server: Unknown message type")
+
+    def test_message_payload_not_inflated(self):
+        content = b'r["local",null,"elsewhere"]\x00' + b'\x00\xff' * 2048
+        mhash = self.server.store_message(self.client.interface, content)
+        sent = []
+        send = self.server.send
+        def spy(msg):
+            sent.append(msg)
+            send(msg)
+        self.server.send = spy
+
+        self.client.get_status() # Says it reads packed frames
+        del sent[:]
+        received = []
+        self.client.send = received.append
+        self.server.message(self.client.interface, mhash)
+
+        self.assertEqual(1, len(sent))
+        self.assertTrue(len(sent[0].content) < len(content) + 512)
+        self.assertEqual(content, received[-1].content.export())
+
+    def test_message_json_for_old_clients(self):
+        # Clients from before packed frames don't advertise them
+        content = b'r["local",null,"elsewhere"]\x00payload'
+        mhash = self.server.store_message(self.client.interface, content)
+        frames = []
+        route = self.client.route
+        def spy(msg):
+            frames.append(msg)
+            route(msg)
+        self.client.route = spy
+        received = []
+        self.client.send = received.append
+        self.server.message(self.client.interface, mhash)
+        self.assertEqual(content, received[-1].content.export())
+        self.assertTrue(any(isinstance(f, JSONFrame) for f in frames))
+        self.assertFalse(any(isinstance(f, PackedFrame) for f in frames))
+
+    def test_server_trim_evicts_oldest(self):
+        status = self.server.client(self.client.interface)['status']
+        status['total_count'] = 2
+        first  = self.server.store_message(self.client.interface, "first")
+        second = self.server.store_message(self.client.interface, "second")
+        third  = self.server.store_message(self.client.interface, "third")
+        messages = self.server.client(self.client.interface)['messages']
+        self.assertEqual([second, third], messages.peek(5))
+        self.assertEqual(2, status['used_count'])
+        self.assertEqual(len("secondthird"), status['used_space'])
+
+    def test_server_store_duplicate(self):
+        self.server.store_message(self.client.interface, "fakey message")
+        self.server.store_message(self.client.interface, "fakey message")
+        status = self.server.client(self.client.interface)['status']
+        self.assertEqual(1, status['used_count'])
+        self.assertEqual(13, status['used_space'])
+
+    def test_server_store_delete_empty(self):
+        status = self.server.client(self.client.interface)['status']
+        mhash = self.server.store_message(self.client.interface, "")
+        self.assertEqual(1, status['used_count'])
+        self.server.delete_message(self.client.interface, mhash)
+        self.assertEqual(0, status['used_count'])
+        self.assertEqual(0, status['used_space'])
+
+    def test_clients_do_not_share_messages(self):
+        self.server.setup_client(['local', None, 'other'])
+        self.server.store_message(self.client.interface, "fakey message")
+        self.assertEqual({}, self.server.client(['local', None, 'other'])['messages'])
+
+
+class TestLogStorage(unittest.TestCase):
+
+    address = ['local', None, 'client']
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.storages = []
+
+    def tearDown(self):
+        for storage in self.storages:
+            storage.close()
+        shutil.rmtree(self.path)
+
+    def _server(self, **kwargs):
+        storage = LogStorage(self.path, **kwargs)
+        self.storages.append(storage)
+        return ForwardServer(None, None, storage=storage, make_jack=False)
+
+    def _restart(self, **kwargs):
+        self.storages.pop().close()
+        return self._server(**kwargs)
+
+    def test_recovery(self):
+        server = self._server()
+        server.setup_client(self.address)
+        hashes = [server.store_message(self.address, 'message %d' % i) for i in range(5)]
+        server.delete_message(self.address, hashes[1])
+
+        server = self._restart()
+        client = server.client(self.address)
+        self.assertEqual([hashes[0]] + hashes[2:], client['messages'].peek(5))
+        self.assertEqual(b'message 3', client['messages'][hashes[3]])
+        self.assertEqual(4, client['status']['used_count'])
+        self.assertEqual(36, client['status']['used_space'])
+
+    def test_recovery_empty_client(self):
+        server = self._server()
+        server.setup_client(self.address)
+        server = self._restart()
+        self.assertEqual(0, server.client(self.address)['status']['used_count'])
+
+    def test_compaction(self):
+        server = self._server(segment_size=256)
+        server.setup_client(self.address)
+        hashes = [server.store_message(self.address, 'message %03d' % i) for i in range(100)]
+        for mhash in hashes[:90]:
+            server.delete_message(self.address, mhash)
+        self.assertTrue(len(os.listdir(self.path)) < 5)
+
+        server = self._restart(segment_size=256)
+        messages = server.client(self.address)['messages']
+        self.assertEqual(hashes[90:95], messages.peek(5))
+        self.assertEqual(b'message 099', messages[hashes[99]])
+
+    def _count_compactions(self, storage):
+        compactions = []
+        compact = storage.compact
+        def counting_compact():
+            compactions.append(1)
+            compact()
+        storage.compact = counting_compact
+        return compactions
+
+    def test_no_compaction_while_live(self):
+        server = self._server(segment_size=256)
+        compactions = self._count_compactions(self.storages[-1])
+        server.setup_client(self.address)
+        hashes = [server.store_message(self.address, 'm%02d' % i) for i in range(50)]
+        self.assertTrue(len(os.listdir(self.path)) > 5)
+        # Small messages, so most of each record is header, address and hash
+        for mhash in hashes[-5:]:
+            server.delete_message(self.address, mhash)
+        self.assertEqual([], compactions)
+
+        server = self._restart(segment_size=256)
+        compactions = self._count_compactions(self.storages[-1])
+        server.delete_message(self.address, hashes[-6])
+        self.assertEqual([], compactions)
+
+    def test_torn_tail(self):
+        server = self._server()
+        server.setup_client(self.address)
+        mhash = server.store_message(self.address, 'complete')
+        self.storages[-1].sync()
+        with open(os.path.join(self.path, '00000000.log'), 'ab') as f:
+            f.write(b'A\x00\x00\x00')
+
+        server = self._restart()
+        server.store_message(self.address, 'after recovery')
+        server = self._restart()
+        messages = server.client(self.address)['messages']
+        self.assertEqual(2, len(messages))
+        self.assertEqual(b'complete', messages[mhash])
+
+
+    def test_corrupt_record(self):
+        server = self._server(segment_size=128)
+        server.setup_client(self.address)
+        hashes = [server.store_message(self.address, 'message %d' % i) for i in range(4)]
+        self.storages[-1].sync()
+        for name in os.listdir(self.path):
+            with open(os.path.join(self.path, name), 'rb') as f:
+                data = f.read()
+            if b'message 1' in data:
+                with open(os.path.join(self.path, name), 'wb') as f:
+                    f.write(data.replace(b'message 1', b'massage 1'))
+
+        # Replay stops at the bad record, setting aside later segments
+        server = self._restart(segment_size=128)
+        self.assertEqual(hashes[:1], server.client(self.address)['messages'].peek(5))
+        self.assertTrue(any(n.endswith('.bad') for n in os.listdir(self.path)))
+        server.store_message(self.address, 'after recovery')
+        server = self._restart(segment_size=128)
+        self.assertEqual(2, len(server.client(self.address)['messages']))
+
+
+class TestServerLimits(unittest.TestCase):
+
+    def _server(self, **kwargs):
+        server = ForwardServer(None, None, make_jack=False, **kwargs)
+        server.setup_client(['local', None, 'heavy'])
+        server.setup_client(['local', None, 'light'])
+        return server
+
+    def _messages(self, server, name):
+        return server.client(['local', None, name])['messages']
+
+    def test_setup_client_quota(self):
+        server = self._server()
+        server.setup_client(['local', None, 'small'], total_count=2, total_space=100)
+        for i in range(5):
+            server.store_message(['local', None, 'small'], 'message %d' % i)
+        self.assertEqual(2, len(self._messages(server, 'small')))
+
+    def test_shared_content(self):
+        server = self._server()
+        content = b'broadcast' * 100
+        for name in ('heavy', 'light', 'heavy'):
+            server.store_message(['local', None, name], content)
+        contents = server.storage.contents
+        self.assertEqual(len(content), contents.space)
+        self.assertEqual(len(content), server.stored_space)
+        self.assertEqual(2 * len(content), server.used_space)
+        self.assertEqual(1, server.client(['local', None, 'heavy'])['status']['used_count'])
+
+        mhash = server.client(['local', None, 'heavy'])['messages'].peek(1)[0]
+        server.delete_message(['local', None, 'heavy'], mhash)
+        self.assertEqual(len(content), contents.space)
+        server.delete_message(['local', None, 'light'], mhash)
+        self.assertEqual(0, contents.space)
+
+    def test_global_limit_counts_shared_content_once(self):
+        content = b'broadcast' * 100
+        server = self._server(total_space=2 * len(content))
+        for name in ('a', 'b', 'c', 'd'):
+            server.setup_client(['local', None, name])
+            server.store_message(['local', None, name], content)
+        self.assertEqual(4, server.used_space // len(content))
+        for name in ('a', 'b', 'c', 'd'):
+            self.assertEqual(1, len(self._messages(server, name)))
+
+        server.store_message(['local', None, 'a'], b'other' * 200)
+        server.store_message(['local', None, 'b'], b'third' * 200)
+        self.assertTrue(server.stored_space <= 2 * len(content))
+
+    def test_expire(self):
+        server = self._server(message_ttl=60)
+        old = server.store_message(['local', None, 'heavy'], 'old')
+        acked = server.store_message(['local', None, 'light'], 'acked')
+        server.delete_message(['local', None, 'light'], acked)
+        server.expire(time.time() + 30)
+        self.assertEqual(1, len(self._messages(server, 'heavy')))
+        server.expire(time.time() + 61)
+        self.assertEqual(0, len(self._messages(server, 'heavy')))
+        self.assertEqual(0, server.used_space)
+        self.assertEqual(0, server.client(['local', None, 'heavy'])['status']['used_count'])
+
+    def test_expire_restored_message(self):
+        server = self._server(message_ttl=60)
+        mhash = server.store_message(['local', None, 'heavy'], 'message')
+        server.delete_message(['local', None, 'heavy'], mhash)
+        server.message_ttl = 120
+        server.store_message(['local', None, 'heavy'], 'message')
+        server.expire(time.time() + 61)
+        self.assertEqual(1, len(self._messages(server, 'heavy')))
+        server.expire(time.time() + 121)
+        self.assertEqual(0, len(self._messages(server, 'heavy')))
+
+    def test_global_limit_evicts_heaviest(self):
+        server = self._server(total_space=100)
+        for i in range(8):
+            server.store_message(['local', None, 'heavy'], 'heavy %04d' % i)
+        light = server.store_message(['local', None, 'light'], 'light 0000')
+        server.store_message(['local', None, 'light'], 'light 0001')
+        for i in range(8, 12):
+            server.store_message(['local', None, 'heavy'], 'heavy %04d' % i)
+        self.assertTrue(server.used_space <= 100)
+        self.assertEqual(2, len(self._messages(server, 'light')))
+        self.assertEqual(8, len(self._messages(server, 'heavy')))
+        self.assertEqual(server.used_space,
+            sum(server.client(['local', None, n])['status']['used_space'] for n in ('heavy', 'light')))
+
+
+class TestStreaming(TestCaseWithLog):
+
+    def setUp(self):
+        TestCaseWithLog.setUp(self)
+        from ejtp.applications.ejforward.server import test_setup
+        self.client, self.server = test_setup()
+        self.batches = []
+        self.lost = [] # Batches to lose in transit, by position
+        self.write_packed = self.server.write_packed
+        def spy(target, data):
+            self.batches.append(data)
+            if len(self.batches) - 1 not in self.lost:
+                self.write_packed(target, data)
+        self.server.write_packed = spy
+        self.forwarded = []
+        self.client.forward = self.forwarded.append
+
+    def _store(self, count, size=100):
+        for i in range(count):
+            self.server.store_message(self.client.interface,
+                ('j\x00"%0*d"' % (size, i)).encode())
+
+    def test_drain_backlog(self):
+        self._store(60)
+        self.client.stream(window=30)
+        self.assertEqual(60, len(self.forwarded))
+        self.assertEqual(b'j\x00"' + b'0' * 100 + b'"', self.forwarded[0])
+        self.assertEqual(0, self.server.client(self.client.interface)['status']['used_count'])
+        # ~20 messages of ~104 bytes fit in one 2048 byte batch
+        self.assertTrue(len(self.batches) <= 4)
+
+    def test_lost_batch(self):
+        self._store(60)
+        self.lost = [0]
+        self.client.stream(window=60)
+        # Later batches are held rather than acknowledged past the gap
+        self.assertEqual([], self.forwarded)
+        self.assertEqual(60, self.server.client(self.client.interface)['status']['used_count'])
+
+        self.client.stream(window=60)
+        self.assertEqual(60, len(self.forwarded))
+        self.assertEqual(b'j\x00"' + b'0' * 100 + b'"', self.forwarded[0])
+        self.assertEqual(0, self.server.client(self.client.interface)['status']['used_count'])
+
+    def test_reordered_batch(self):
+        self._store(60)
+        self.lost = [0]
+        self.client.stream(window=60)
+        self.assertTrue(len(self.batches) > 1)
+        # The first batch turns up late
+        self.write_packed(self.client.interface, self.batches[0])
+        self.assertEqual(60, len(self.forwarded))
+        self.assertEqual(sorted(self.forwarded), self.forwarded)
+        self.assertEqual(0, self.server.client(self.client.interface)['status']['used_count'])
+
+    def test_window(self):
+        self._store(10)
+        self.client.ack_through = lambda seq: None # Client never acks
+        self.client.stream(window=4)
+        self.assertEqual(4, len(self.forwarded))
+        self.assertEqual(10, self.server.client(self.client.interface)['status']['used_count'])
+
+    def test_restream_resends_inflight(self):
+        self._store(3)
+        self.client.ack_through = lambda seq: None
+        self.client.stream(window=10)
+        self.client.stream(window=10)
+        self.assertEqual(6, len(self.forwarded))
+        self.assertEqual([0, 3], [batch['seq'] for batch in self.batches])
+
+    def test_push_new_messages(self):
+        self.client.stream()
+        self._store(1)
+        self.server.push(self.client.interface)
+        self.assertEqual(1, len(self.forwarded))
+        self.assertEqual(0, self.server.client(self.client.interface)['status']['used_count'])
+
+
+class TestShardedServer(unittest.TestCase):
+
+    def setUp(self):
+        router = Router()
+        server_addr = ['local', None, 'server']
+        self.server = ShardedForwardServer(router, server_addr, shards=2)
+        self.clients = [
+            ForwardClient(router, ['local', None, name], server_addr)
+            for name in ('alpha', 'beta', 'gamma', 'delta')
+        ]
+        self.sender = Client(router, ['local', None, 'sender'])
+        cache = self.server.encryptor_cache
+        self.server.encryptor_set(server_addr, ['rotate', 3])
+        self.server.encryptor_set(self.sender.interface, ['rotate', 7])
+        for i, client in enumerate(self.clients):
+            self.server.encryptor_set(client.interface, ['rotate', 10 + i])
+            client.encryptor_cache = cache
+        self.sender.encryptor_cache = cache
+        self.server.start()
+        for client in self.clients:
+            self.server.setup_client(client.interface)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_shard_choice(self):
+        shards = [self.server.shard(client.interface) for client in self.clients]
+        self.assertEqual(shards, [self.server.shard(client.interface) for client in self.clients])
+        self.assertEqual(set([0, 1]), set(shards))
+
+    def test_get_status(self):
+        done = threading.Event()
+        statuses = []
+        def on_status(client):
+            statuses.append(client.status['used_count'])
+            if len(statuses) == len(self.clients):
+                done.set()
+        for client in self.clients:
+            client.get_status(on_status)
+        self.assertTrue(done.wait(10))
+        self.assertEqual([0] * len(self.clients), statuses)
+
+    def test_relay(self):
+        done = threading.Event()
+        forwarded = []
+        def forward(internal):
+            forwarded.append(internal)
+            done.set()
+        client = self.clients[0]
+        client.forward = forward
+        self.sender.owrite_json([self.server.interface, client.interface], {'type':'example'})
+        self.assertTrue(done.wait(10))
+        self.assertEqual(client.interface, createFrame(forwarded[0]).address)
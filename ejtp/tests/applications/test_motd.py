@@ -1,3 +1,7 @@
+import os
+import tempfile
+import time
+
 from ejtp.util.compat import unittest
 
 from ejtp.applications.motd import MOTDServer, MOTDClient
@@ -19,3 +23,57 @@ class TestMotd(unittest.TestCase):
         def assert_response(msg, c):
             self.assertEqual(msg.unpack()['content'], 'Example message')
         self.client.request(self.server.interface, assert_response)
+
+    def _write(self, text, mtime):
+        with open(self.server.filename, 'w') as wfile:
+            wfile.write(text)
+        os.utime(self.server.filename, (mtime, mtime))
+
+    def test_file_cached(self):
+        responses = []
+        def on_response(msg, c):
+            responses.append(msg.unpack()['content'])
+        now = [1000.0]
+        self.server.clock = lambda: now[0]
+        handle, self.server.filename = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.server.filename)
+        old = time.time() - 60
+
+        self._write('First message', old)
+        self.client.request(self.server.interface, on_response)
+        self._write('Second message', old)
+        self.client.request(self.server.interface, on_response)
+        self.assertEqual(['First message', 'First message'], responses)
+
+        now[0] += self.server.check_interval
+        self.client.request(self.server.interface, on_response)
+        self.assertEqual('Second message', responses[-1])
+
+        # Same size and mtime, told apart by the change time
+        self._write('Third  message', old)
+        now[0] += self.server.check_interval
+        self.client.request(self.server.interface, on_response)
+        self.assertEqual('Third  message', responses[-1])
+
+    def test_fresh_file_compared(self):
+        responses = []
+        def on_response(msg, c):
+            responses.append(msg.unpack()['content'])
+        now = [1000.0]
+        self.server.clock = lambda: now[0]
+        handle, self.server.filename = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.server.filename)
+        # A file system too coarse to tell two quick writes apart
+        modified = time.time()
+        class Stat(object):
+            st_ino, st_size, st_mtime, st_ctime = 1, 13, modified, modified
+        self.server.stat = lambda path: Stat
+
+        self._write('First message', modified)
+        self.client.request(self.server.interface, on_response)
+        self._write('Other message', modified)
+        now[0] += self.server.check_interval
+        self.client.request(self.server.interface, on_response)
+        self.assertEqual(['First message', 'Other message'], responses)
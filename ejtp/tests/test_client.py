@@ -68,3 +68,154 @@ class TestClient(TestCaseWithLog):
         c2.write_json(c1.interface, "goodbye")
         self.assertInLog("Client ['udp', ['127.0.0.1', 555], 'c2'] recieved from ['udp', ['127.0.0.1', 555], 'c1']: JSONFrame: RawData((0x6a,0x0,0x22,0x68,0x65,0x6c,0x6c,0x6f,0x22))")
         self.assertInLog("Client ['udp', ['127.0.0.1', 555], 'c1'] recieved from ['udp', ['127.0.0.1', 555], 'c2']: JSONFrame: RawData((0x6a,0x0,0x22,0x67,0x6f,0x6f,0x64,0x62,0x79,0x65,0x22))")
+
+    def _chat_pair(self):
+        router = Router()
+        c1 = Client(router, ['local', None, 'c1'], make_jack=False)
+        c2 = Client(router, ['local', None, 'c2'], make_jack=False)
+        c1.encryptor_cache = c2.encryptor_cache
+        c1.encryptor_set(c1.interface, ['rotate',  3])
+        c1.encryptor_set(c2.interface, ['rotate', -7])
+        received = []
+        c2.rcv_callback = lambda msg, client_obj: received.append((msg.sender, msg.unpack()))
+        return c1, c2, received
+
+    def test_write_json_many(self):
+        c1, c2, received = self._chat_pair()
+        sent = []
+        def send(msg):
+            sent.append(msg)
+            Client.send(c1, msg)
+        c1.send = send
+
+        c1.write_json_many(c2.interface, ["one", "two", "three"])
+        self.assertEqual(1, len(sent))
+        self.assertEqual([(c1.interface, "one"), (c1.interface, "two"), (c1.interface, "three")], received)
+
+    def test_write_json_many_split(self):
+        c1, c2, received = self._chat_pair()
+        c1.bundle_size = 20
+        sent = []
+        def send(msg):
+            sent.append(msg)
+            Client.send(c1, msg)
+        c1.send = send
+
+        c1.write_json_many(c2.interface, ["one", "two", "three"])
+        self.assertEqual(2, len(sent))
+        self.assertEqual(["one", "two", "three"], [data for (sender, data) in received])
+
+    def test_queue_json(self):
+        c1, c2, received = self._chat_pair()
+        c1.bundle_window = 60
+        c1.queue_json(c2.interface, "one")
+        c1.queue_json(c2.interface, "two")
+        self.assertEqual([], received)
+        c1.flush_json()
+        self.assertEqual([(c1.interface, "one"), (c1.interface, "two")], received)
+        c1.flush_json()
+        self.assertEqual(2, len(received))
+
+    def test_queue_json_full(self):
+        c1, c2, received = self._chat_pair()
+        c1.bundle_window = 60
+        c1.bundle_size = 10
+        c1.queue_json(c2.interface, "a long message")
+        self.assertEqual([(c1.interface, "a long message")], received)
+
+    def test_queue_json_stale_timer(self):
+        from ejtp.address import str_address
+        c1, c2, received = self._chat_pair()
+        c1.bundle_window = 60
+        c1.queue_json(c2.interface, "one")
+        c1.flush_json()
+        c1.queue_json(c2.interface, "two")
+        # The first batch's timer firing late leaves the second alone
+        c1._flush_batch(str_address(c2.interface), 1)
+        self.assertEqual([(c1.interface, "one")], received)
+        c1._flush_batch(str_address(c2.interface), 2)
+        self.assertEqual([(c1.interface, "one"), (c1.interface, "two")], received)
+
+    def test_write_packed(self):
+        c1, c2, received = self._chat_pair()
+        c1.write_packed(c2.interface, {'data': b'\x00\x01'})
+        self.assertEqual([(c1.interface, {'data': b'\x00\x01'})], received)
+
+    def test_request_json(self):
+        c1, c2, received = self._chat_pair()
+        pending = []
+        def on_request(msg, client_obj):
+            pending.append(msg)
+        c2.rcv_callback = on_request
+
+        futures = [c1.request_json(c2.interface, {'n': n}) for n in range(3)]
+        self.assertFalse(any(f.done() for f in futures))
+        for msg in reversed(pending):
+            c2.respond_json(msg, {'double': msg.unpack()['n'] * 2})
+        self.assertEqual([0, 2, 4], [f.result(0).unpack()['double'] for f in futures])
+        self.assertEqual({}, c1._requests)
+
+    def test_request_json_timeout(self):
+        from concurrent.futures import TimeoutError
+        c1, c2, received = self._chat_pair()
+        future = c1.request_json(c2.interface, {}, timeout=0.01)
+        self.assertRaises(TimeoutError, future.result, 5)
+        self.assertEqual({}, c1._requests)
+
+    def test_request_json_cancel(self):
+        c1, c2, received = self._chat_pair()
+        pending = []
+        c2.rcv_callback = lambda msg, client_obj: pending.append(msg)
+        late = []
+        c1.rcv_callback = lambda msg, client_obj: late.append(msg)
+        future = c1.request_json(c2.interface, {})
+        self.assertTrue(future.cancel())
+        c2.respond_json(pending[0], {})
+        self.assertEqual([{'response_to': 1}], [msg.unpack() for msg in late])
+        self.assertTrue(future.cancelled())
+
+    def test_request_json_unrelated_response_to(self):
+        c1, c2, received = self._chat_pair()
+        c2.rcv_callback = lambda msg, client_obj: None
+        late = []
+        c1.rcv_callback = lambda msg, client_obj: late.append(msg.unpack())
+        future = c1.request_json(c2.interface, {})
+        c2.write_json(c1.interface, {'response_to': 'not a request'})
+        c2.write_json(c1.interface, {'response_to': [1]})
+        self.assertEqual(
+            [{'response_to': 'not a request'}, {'response_to': [1]}],
+            late
+        )
+        self.assertFalse(future.done())
+
+    def test_request_json_expiry_order(self):
+        from concurrent.futures import TimeoutError
+        c1, c2, received = self._chat_pair()
+        slow = c1.request_json(c2.interface, {}, timeout=60)
+        fast = c1.request_json(c2.interface, {}, timeout=0.01)
+        self.assertRaises(TimeoutError, fast.result, 5)
+        self.assertFalse(slow.done())
+        self.assertEqual(1, len(c1._requests))
+
+    def test_rate_limiter(self):
+        from ejtp.dispatch import RateLimiter
+        c1, c2, received = self._chat_pair()
+        c2.rate_limiter = RateLimiter(0.001, burst=2)
+        for n in range(4):
+            c1.write_json(c2.interface, n)
+        self.assertEqual([0, 1], [data for (sender, data) in received])
+        self.assertEqual(2, c2.rate_limiter.dropped)
+
+    def test_rate_limiter_forged_sender(self):
+        from ejtp import frame
+        from ejtp.dispatch import RateLimiter
+        from ejtp.identity import Identity
+        c1, c2, received = self._chat_pair()
+        c2.rate_limiter = RateLimiter(0.001, burst=2)
+        forger = Identity('forger', ['rotate', 99], c1.interface)
+        forged = frame.signed.construct(forger, frame.json.construct('forged').content)
+        for n in range(3):
+            self.assertRaises(ValueError, c2.route, forged)
+        for n in range(2):
+            c1.write_json(c2.interface, n)
+        self.assertEqual([0, 1], [data for (sender, data) in received])
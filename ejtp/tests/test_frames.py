@@ -27,13 +27,16 @@ class RegistrationPreservingTest(unittest.TestCase):
         Stores all previously registered frame types
         '''
         self._old_frametypes = frame.registration._frametypes
+        self._old_dispatch = frame.registration._dispatch
         frame.registration._frametypes = {}
+        frame.registration._dispatch = [None] * 256
 
     def tearDown(self):
         '''
         Loads all previously stored frame types
         '''
         frame.registration._frametypes = self._old_frametypes
+        frame.registration._dispatch = self._old_dispatch
 
 
 class TestRegistration(RegistrationPreservingTest):
@@ -65,6 +68,18 @@ class TestRegistration(RegistrationPreservingTest):
         
         self.assertRaises(TypeError, test_create_class)
     
+    def test_register_lazy(self):
+        # Builtin frames load on first use, even into an empty registry
+        f = frame.registration.createFrameFromBytes(b'j\x00"hi"')
+        self.assertEqual(frame.registration._dispatch[ord('j')], frame.json.JSONFrame)
+
+        def test_shadow_builtin():
+            @frame.RegisterFrame('c')
+            class MyCFrame(frame.base.BaseFrame):
+                pass
+
+        self.assertRaises(ValueError, test_shadow_builtin)
+
     def test_create_frame(self):
         @frame.RegisterFrame('a')
         class MyAFrame(frame.base.BaseFrame):
@@ -74,6 +89,19 @@ class TestRegistration(RegistrationPreservingTest):
         self.assertTrue(isinstance(f, MyAFrame))
         self.assertRaises(ValueError, frame.registration.createFrame,  'qfoobar')
         self.assertRaises(TypeError, frame.registration.createFrame, 1234)
+        self.assertRaises(ValueError, frame.registration.createFrame, '')
+
+    def test_create_frame_from_bytes(self):
+        @frame.RegisterFrame('a')
+        class MyAFrame(frame.base.BaseFrame):
+            pass
+
+        f = frame.registration.createFrameFromBytes(b'afoobar')
+        self.assertTrue(isinstance(f, MyAFrame))
+        self.assertEqual(f, frame.registration.createFrame('afoobar'))
+        self.assertEqual(frame.registration._dispatch[ord('a')], MyAFrame)
+        self.assertRaises(ValueError, frame.registration.createFrameFromBytes, b'qfoobar')
+        self.assertRaises(ValueError, frame.registration.createFrameFromBytes, b'')
 
         
 class TestBaseFrame(RegistrationPreservingTest):
@@ -198,3 +226,42 @@ class TestSignedFrame(unittest.TestCase):
         signed_content = RawData('s["testing"]\x00') + (siglen//256, siglen%256) + signature + 'foo'
         self.assertEqual(frame.signed.SignedFrame(signed_content).decode(cache), RawData('foo'))
         self.assertRaises(ValueError, frame.signed.SignedFrame('s["testing"]\x00\x00\x07invalidfoo').decode, cache)
+
+
+class TestBundleFrame(unittest.TestCase):
+    def test_registration(self):
+        self.assertEqual(frame.createFrame('m\x00'), frame.bundle.BundleFrame('m\x00'))
+
+    def test_construct(self):
+        self.assertEqual(
+            frame.bundle.construct(['j\x00"a"', 'j\x00"bc"']),
+            frame.bundle.BundleFrame('m\x00\x00\x00\x00\x05j\x00"a"\x00\x00\x00\x06j\x00"bc"')
+        )
+
+    def test_decode(self):
+        bundle = frame.bundle.BundleFrame('m\x00\x00\x00\x00\x05j\x00"a"')
+        self.assertEqual(bundle.decode(), [b'j\x00"a"'])
+        self.assertEqual(frame.bundle.construct([]).decode(), [])
+        self.assertRaises(ValueError, frame.bundle.BundleFrame('m\x00\x00\x00\x00\x09j\x00"a"').decode)
+        self.assertRaises(ValueError, frame.bundle.BundleFrame('m\x00\x00\x00').decode)
+
+    def test_unpack(self):
+        bundle = frame.bundle.construct(['j\x00"a"', 'j\x00"b"'])
+        inner = bundle.unpack()
+        self.assertEqual(inner, [
+            frame.json.JSONFrame('j\x00"a"', [bundle]),
+            frame.json.JSONFrame('j\x00"b"', [bundle]),
+        ])
+        self.assertEqual([f.unpack() for f in inner], ['a', 'b'])
+
+
+class TestPackedFrame(unittest.TestCase):
+    def test_registration(self):
+        self.assertEqual(frame.createFrame('p\x00'), frame.packed.PackedFrame('p\x00'))
+
+    def test_construct(self):
+        self.assertEqual(frame.packed.construct([1,2,3]), frame.packed.PackedFrame(b'p\x00\x93\x01\x02\x03'))
+
+    def test_unpack(self):
+        data = {'type': 'example', 'data': b'\x00\xff'}
+        self.assertEqual(frame.packed.construct(data).unpack(), data)
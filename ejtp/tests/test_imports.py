@@ -0,0 +1,56 @@
+from ejtp.util.compat import unittest
+
+import os
+import sys
+import subprocess
+
+import ejtp
+
+# Cumulative import time budgets in microseconds. These are several times
+# what the imports take on a laptop, so they only catch big regressions;
+# SLOW_MODULES catches the usual way those happen.
+BUDGETS = {
+    'ejtp.frame': 50000,
+    'ejtp.crypto': 50000,
+    'ejtp.client': 100000,
+}
+
+# Modules only some callers need, which must be imported on first use
+SLOW_MODULES = ('Crypto', 'streql', 'bz2', 'unittest', 'ejtp.frame.compressed')
+
+def importtime(module):
+    '''
+    Import module in a fresh interpreter under -X importtime, returning
+    {name: cumulative microseconds} for every module it imported.
+    '''
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(ejtp.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([root] + [p for p in sys.path if p])
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        env=env,
+        stderr=subprocess.PIPE,
+    )
+    stderr = process.communicate()[1].decode('utf-8')
+    if process.returncode:
+        raise AssertionError(stderr)
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+    return times
+
+@unittest.skipIf(sys.version_info < (3, 7), '-X importtime requires Python 3.7')
+class TestImportTime(unittest.TestCase):
+
+    def test_budgets(self):
+        for module, budget in sorted(BUDGETS.items()):
+            times = importtime(module)
+            self.assertLessEqual(times[module], budget,
+                '%s took %d us to import' % (module, times[module]))
+            for name in times:
+                self.assertFalse(name.split('.')[0] in SLOW_MODULES or name in SLOW_MODULES,
+                    'importing %s imported %s' % (module, name))
@@ -4,7 +4,7 @@ import threading
 
 from persei import String, RawData
 
-from ejtp import router, client
+from ejtp import router, client, metrics
 from ejtp.jacks.stream import Connection
 
 class TestJacks(unittest.TestCase):
@@ -33,6 +33,51 @@ class TestJacks(unittest.TestCase):
             ['tcp', ['::1', 8999], 'charlie'],
             ['tcp', ['::1', 9999], 'stacy'])
 
+    def test_loopback(self):
+        ifaceA = ['loopback', 'routerA', 'charlie']
+        ifaceB = ['loopback', 'routerB', 'stacy']
+        clientA = client.Client(self.routerA, ifaceA)
+        clientB = client.Client(self.routerB, ifaceB)
+        clientA.encryptor_cache = clientB.encryptor_cache
+        clientA.encryptor_set(ifaceA, ['rotate', 43])
+        clientA.encryptor_set(ifaceB, ['rotate', 93])
+
+        received = []
+        def rcv_callback(msg, client_obj):
+            received.append((client_obj.interface, msg.sender, msg.unpack()))
+            if client_obj is clientB:
+                clientB.write_json(ifaceA, 'B => A')
+        clientA.rcv_callback = clientB.rcv_callback = rcv_callback
+
+        # Delivery is synchronous, replies included
+        clientA.write_json(ifaceB, 'A => B')
+        self.assertEqual([
+            (ifaceB, ifaceA, 'A => B'),
+            (ifaceA, ifaceB, 'B => A'),
+        ], received)
+
+    def test_loopback_unknown_endpoint(self):
+        clientA = client.Client(self.routerA, ['loopback', 'routerA', 'charlie'])
+        clientA.encryptor_set(clientA.interface, ['rotate', 4])
+        clientA.encryptor_set(['loopback', 'nowhere', 'x'], ['rotate', 3])
+        received = []
+        clientA.rcv_callback = lambda msg, client_obj: received.append(msg)
+        before = metrics.snapshot()['counters'].get('undeliverable', 0)
+        clientA.write_json(['loopback', 'nowhere', 'x'], 'lost')
+        self.assertEqual(before + 1, metrics.snapshot()['counters'].get('undeliverable', 0))
+        self.assertEqual([], received)
+
+    def test_loopback_endpoint_per_client(self):
+        clientA = client.Client(self.routerA, ['loopback', 'routerA', 'charlie'])
+        clientB = client.Client(self.routerA, ['loopback', 'routerA2', 'stacy'])
+        clientC = client.Client(self.routerA, ['loopback', 'routerA', 'lucy'])
+        self.assertEqual(
+            [('loopback', 'routerA'), ('loopback', 'routerA2')],
+            sorted(jack.interface for jack in self.routerA._jacks.values())
+        )
+        # An endpoint belongs to one router
+        self.assertRaises(ValueError, client.Client, self.routerB, ['loopback', 'routerA', 'x'])
+
     def make_test(self, ifaceA, ifaceB, messageAB='A => B', messageBA='B => A', timeout=0.5):
         clientA = client.Client(self.routerA, ifaceA)
         clientB = client.Client(self.routerB, ifaceB)
@@ -94,3 +139,16 @@ class TestJackStream(unittest.TestCase):
         self.connection.inject(self.wrapped[5:])
         self.assertEqual(RawData(self.plaintext), self.connection.recv())
 
+
+    def test_receive_queue_bounded(self):
+        self.connection = Connection()
+        self.connection._outqueue.maxsize = 2
+        for text in ("one", "two", "three"):
+            self.connection.inject(self.connection.wrap(text))
+        self.assertEqual(1, self.connection.dropped)
+        self.assertEqual(RawData("two"), self.connection.recv())
+
+    def test_receive_several(self):
+        self.connection.inject(self.wrapped + self.connection.wrap("second"))
+        self.assertEqual(RawData(self.plaintext), self.connection.recv())
+        self.assertEqual(RawData("second"), self.connection.recv())
@@ -0,0 +1,39 @@
+from ejtp.util.compat import unittest
+
+from ejtp import metrics
+from ejtp.client import Client
+from ejtp.frame import json as json_frame
+from ejtp.router import Router
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.router = Router()
+
+    def test_router_drops(self):
+        self.router.recv(b'\xfe not a frame')
+        self.router.recv(b'r["local",null,"nobody"]\x00ciphertext')
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(1, counters['parse_errors'])
+        self.assertEqual(1, counters['undeliverable'])
+
+    def test_stages(self):
+        c1 = Client(self.router, ['local', None, 'c1'], make_jack=False)
+        c2 = Client(self.router, ['local', None, 'c2'], make_jack=False)
+        c1.encryptor_cache = c2.encryptor_cache
+        c1.encryptor_set(c1.interface, ['rotate', 3])
+        c1.encryptor_set(c2.interface, ['rotate', 5])
+        c2.rcv_callback = lambda msg, client_obj: None
+        c1.write_json(c2.interface, 'hello')
+        histograms = metrics.snapshot()['histograms']
+        for stage in ('decrypt', 'verify', 'callback'):
+            self.assertEqual(1, histograms[stage]['count'])
+
+    def test_verify_errors(self):
+        c1 = Client(self.router, ['local', None, 'c1'], make_jack=False)
+        c1.encryptor_set(c1.interface, ['rotate', 3])
+        msg = c1.wrap_sender(json_frame.construct('hi'))
+        c1.encryptor_set(c1.interface, ['rotate', 4])
+        self.assertRaises(ValueError, msg.unpack, c1.encryptor_cache)
+        self.assertEqual(1, metrics.snapshot()['counters']['verify_errors'])
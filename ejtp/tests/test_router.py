@@ -49,3 +49,191 @@ class TestRouterStream(TestCaseWithLog):
 
     def test_frame_with_weird_type(self):
         self._test_message('Router could not parse frame: \'x["local",null,"example"]\\x00Jam and cookies\'', format='x')
+
+
+class TestRouterRelay(unittest.TestCase):
+
+    def setUp(self):
+        from ejtp.jacks import Jack
+        class RecordingJack(Jack):
+            def run(self, *args):
+                pass
+            def route_raw(self, address, data):
+                self.relayed.append((address, data))
+
+        self.router = router.Router()
+        self.jack = RecordingJack(self.router, ('udp4', None))
+        self.jack.relayed = []
+
+    def test_relay_to_jack(self):
+        data = b'r["udp4",["127.0.0.1",9002],"pong"]\x00ciphertext'
+        self.router.recv(data)
+        self.router.recv(data)
+        expected = (['udp4', ['127.0.0.1', 9002], 'pong'], data)
+        self.assertEqual([expected, expected], self.jack.relayed)
+        self.assertEqual(1, len(self.router._relay_routes))
+
+    def test_no_relay_to_client(self):
+        from ejtp.client import Client
+        client = Client(self.router, ['udp4', ['127.0.0.1', 9002], 'pong'], make_jack=False)
+        routed = []
+        client.route = routed.append
+        self.router.recv(b'r["udp4",["127.0.0.1",9002],"pong"]\x00ciphertext')
+        self.assertEqual([], self.jack.relayed)
+        self.assertEqual(1, len(routed))
+
+    def test_client_load_clears_routes(self):
+        from ejtp.client import Client
+        self.router.recv(b'r["udp4",["127.0.0.1",9002],"pong"]\x00ciphertext')
+        Client(self.router, ['udp4', ['127.0.0.1', 9002], 'pong'], make_jack=False)
+        self.assertEqual({}, self.router._relay_routes)
+
+    def test_no_relay_for_sender_frames(self):
+        self.router.recv(b's["udp4",["127.0.0.1",9002],"pong"]\x00signed')
+        self.assertEqual([], self.jack.relayed)
+
+    def test_relay_in_fresh_process(self):
+        # Frame types load lazily, so check the fast path is taken even when
+        # no frame of any type has been created yet
+        import os, sys, subprocess
+        import ejtp
+        script = '\n'.join([
+            'from ejtp import router',
+            'from ejtp.jacks import Jack',
+            'class RecordingJack(Jack):',
+            '    def route_raw(self, address, data): pass',
+            'r = router.Router()',
+            'RecordingJack(r, ("udp4", None))',
+            'assert r._relay(b\'r["udp4",["127.0.0.1",9002],"pong"]\\x00ciphertext\')',
+        ])
+        env = dict(os.environ)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(ejtp.__file__)))
+        env['PYTHONPATH'] = os.pathsep.join([root] + [p for p in sys.path if p])
+        self.assertEqual(0, subprocess.call([sys.executable, '-c', script], env=env))
+
+
+class TestRouterDispatch(unittest.TestCase):
+
+    def _blocked(self, policy):
+        # Dispatcher with one worker, stuck handling the first frame
+        import threading
+        from ejtp.dispatch import Dispatcher, BLOCK
+        policy = policy or BLOCK
+        started = threading.Event()
+        self.release = threading.Event()
+        handled = []
+        def handler(data):
+            started.set()
+            self.release.wait(5)
+            handled.append(data)
+        dispatcher = Dispatcher(handler, workers=1, queue_size=4 if policy == BLOCK else 2, policy=policy)
+        dispatcher.submit(b'0')
+        self.assertTrue(started.wait(5))
+        return dispatcher, handled
+
+    def test_drop_newest(self):
+        from ejtp.dispatch import DROP_NEWEST
+        dispatcher, handled = self._blocked(DROP_NEWEST)
+        for data in (b'1', b'2', b'3', b'4'):
+            dispatcher.submit(data)
+        self.release.set()
+        dispatcher.stop()
+        self.assertEqual([b'0', b'1', b'2'], handled)
+        self.assertEqual(2, dispatcher.dropped)
+
+    def test_drop_oldest(self):
+        from ejtp.dispatch import DROP_OLDEST
+        dispatcher, handled = self._blocked(DROP_OLDEST)
+        for data in (b'1', b'2', b'3', b'4'):
+            dispatcher.submit(data)
+        self.release.set()
+        dispatcher.stop()
+        self.assertEqual([b'0', b'3', b'4'], handled)
+        self.assertEqual(2, dispatcher.dropped)
+
+    def test_drop_oldest_keeps_stop(self):
+        import threading
+        from ejtp.dispatch import DROP_OLDEST
+        dispatcher, handled = self._blocked(DROP_OLDEST)
+        stopper = threading.Thread(target=dispatcher.stop)
+        stopper.daemon = True
+        stopper.start()
+        while not dispatcher._queues[0].qsize():
+            stopper.join(0.001)
+        for data in (b'1', b'2', b'3'):
+            dispatcher.submit(data)
+        self.release.set()
+        stopper.join(5)
+        self.assertFalse(stopper.is_alive())
+        self.assertEqual(b'0', handled[0])
+
+    def test_client_limit(self):
+        from ejtp.dispatch import DROP_NEWEST
+        dispatcher, handled = self._blocked(DROP_NEWEST)
+        dispatcher.client_limit = 1
+        for data in (b'r["local",null,"a"]\x001', b'r["local",null,"b"]\x002'):
+            dispatcher.submit(data)
+        dispatcher.submit(b'r["local",null,"a"]\x003')
+        self.release.set()
+        dispatcher.stop()
+        self.assertEqual(1, dispatcher.drops['client'])
+        self.assertEqual(3, len(handled))
+
+    def test_jack_limit(self):
+        from ejtp.dispatch import DROP_NEWEST
+        dispatcher, handled = self._blocked(DROP_NEWEST)
+        dispatcher.jack_limit = 1
+        dispatcher.submit(b'1', 'jack one')
+        dispatcher.submit(b'2', 'jack one')
+        dispatcher.submit(b'3', 'jack two')
+        self.release.set()
+        dispatcher.stop()
+        self.assertEqual({'queue': 0, 'jack': 1, 'client': 0}, dispatcher.drops)
+        self.assertEqual([b'0', b'1', b'3'], handled)
+
+    def test_jack_limit_drop_oldest(self):
+        from ejtp.dispatch import DROP_OLDEST
+        dispatcher, handled = self._blocked(DROP_OLDEST)
+        dispatcher.jack_limit = 1
+        dispatcher.submit(b'1', 'jack one')
+        dispatcher.submit(b'2', 'jack one')
+        self.release.set()
+        dispatcher.stop()
+        self.assertEqual({'queue': 0, 'jack': 1, 'client': 0}, dispatcher.drops)
+        self.assertEqual([b'0', b'2'], handled)
+
+    def test_jack_limit_block(self):
+        import threading
+        dispatcher, handled = self._blocked(None)
+        dispatcher.jack_limit = 1
+        dispatcher.submit(b'1', 'jack one')
+        submitted = threading.Event()
+        def submit():
+            dispatcher.submit(b'2', 'jack one')
+            submitted.set()
+        threading.Thread(target=submit).start()
+        self.assertFalse(submitted.wait(0.1))
+        self.release.set()
+        self.assertTrue(submitted.wait(5))
+        dispatcher.stop()
+        self.assertEqual(0, dispatcher.dropped)
+        self.assertEqual([b'0', b'1', b'2'], handled)
+
+    def test_per_client_order(self):
+        from ejtp.client import Client
+        r = router.Router()
+        r.dispatch(workers=4)
+        received = {}
+        for name in ('a', 'b', 'c'):
+            client = Client(r, ['local', None, name], make_jack=False)
+            received[name] = []
+            client.route = lambda msg, name=name: received[name].append(msg.content.export())
+        sent = {}
+        for i in range(50):
+            for name in ('a', 'b', 'c'):
+                data = ('r["local",null,"%s"]\x00%d' % (name, i)).encode()
+                sent.setdefault(name, []).append(data)
+                r.accept(data)
+        r.dispatcher.join()
+        self.assertEqual(sent, received)
+        r.run(router.STOPPED)
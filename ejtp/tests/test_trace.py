@@ -0,0 +1,37 @@
+from ejtp.util.compat import unittest
+
+from ejtp import trace
+from ejtp.client import Client
+from ejtp.router import Router
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.events = []
+        trace.register(self.events.append)
+        self.addCleanup(trace.unregister, self.events.append)
+
+    def test_pipeline(self):
+        router = Router()
+        c1 = Client(router, ['local', None, 'c1'], make_jack=False)
+        c2 = Client(router, ['local', None, 'c2'], make_jack=False)
+        c1.encryptor_cache = c2.encryptor_cache
+        c1.encryptor_set(c1.interface, ['rotate', 3])
+        c1.encryptor_set(c2.interface, ['rotate', 5])
+        c2.rcv_callback = lambda msg, client_obj: None
+        c1.write_json(c2.interface, 'hello')
+
+        points = [e.point for e in self.events]
+        for point in ('owrite', 'route', 'unpack', 'decrypt', 'verify', 'createFrame'):
+            self.assertTrue(point in points, point)
+        owrite = [e for e in self.events if e.point == 'owrite'][0]
+        self.assertEqual('j', owrite.frame_type)
+        self.assertTrue(owrite.seconds >= 0)
+        decrypt = [e for e in self.events if e.point == 'decrypt'][0]
+        self.assertEqual('r', decrypt.frame_type)
+
+    def test_error(self):
+        from ejtp.frame import createFrame
+        self.assertRaises(ValueError, createFrame, b'\xfe')
+        self.assertEqual('createFrame', self.events[-1].point)
+        self.assertTrue(isinstance(self.events[-1].error, ValueError))
@@ -21,7 +21,7 @@ import json
 
 from persei import RawData, String
 
-from ejtp.util import hasher
+from ejtp.util import hasher, compact
 from ejtp.util.crashnicely import Guard
 from ejtp.util.compat import unittest, StringIO
 
@@ -125,6 +125,81 @@ class TestHasherChecksum(unittest.TestCase):
         self.assertEqual(RawData(expected), RawData(value))
 
 
+class TestCompact(unittest.TestCase):
+
+    def setUp(self):
+        # Exercise the pure python implementation
+        self._msgpack = compact._msgpack
+        compact._msgpack = None
+
+    def tearDown(self):
+        compact._msgpack = self._msgpack
+
+    def _assert(self, expected, value):
+        self.assertEqual(expected, compact.pack(value))
+        self.assertEqual(value, compact.unpack(expected))
+
+    def test_scalars(self):
+        self._assert(b'\xc0', None)
+        self._assert(b'\xc3', True)
+        self._assert(b'\xc2', False)
+        self._assert(b'\xcb?\xf8\x00\x00\x00\x00\x00\x00', 1.5)
+
+    def test_int(self):
+        self._assert(b'\x7f', 127)
+        self._assert(b'\xcc\x80', 128)
+        self._assert(b'\xcd\x01\x00', 256)
+        self._assert(b'\xff', -1)
+        self._assert(b'\xd0\xdf', -33)
+        self._assert(b'\xd1\xff\x7f', -129)
+        self.assertRaises(ValueError, compact.pack, 2**64)
+
+    def test_string(self):
+        self._assert(b'\xa4test', 'test')
+        self._assert(b'\xd9\x20' + b'a' * 32, 'a' * 32)
+        self.assertEqual(b'\xa4test', compact.pack(String('test')))
+
+    def test_bytes(self):
+        self._assert(b'\xc4\x03\x00\x01\x02', b'\x00\x01\x02')
+        self.assertEqual(b'\xc4\x03\x00\x01\x02', compact.pack(RawData((0, 1, 2))))
+
+    def test_list(self):
+        self._assert(b'\x93\x01\x02\x03', [1, 2, 3])
+        self.assertEqual(b'\x93\x01\x02\x03', compact.pack((1, 2, 3)))
+
+    def test_dict(self):
+        # Keys are ordered by their packed bytes, not insertion order
+        self._assert(b'\x83\x01\xa1x\xa1a\x02\xa2aa\x03', {'aa': 3, 'a': 2, 1: 'x'})
+
+    def test_unpack_errors(self):
+        self.assertRaises(ValueError, compact.unpack, b'\xc1')
+        self.assertRaises(ValueError, compact.unpack, b'\x92\x01')
+        self.assertRaises(ValueError, compact.unpack, b'\x01\x02')
+        self.assertRaises(TypeError, compact.pack, object())
+
+    def test_unpack_rejects(self):
+        # Both implementations reject the same inputs
+        deep = b'\x91' * compact.MAX_DEPTH
+        accepted = [deep + b'\xc0', b'\x81\x01\x90']
+        rejected = [deep + b'\x90', b'\x91' * 5000, b'\x81\x91\x01\x02', b'\x81\x80\x02']
+        implementations = [None, self._msgpack] if self._msgpack else [None]
+        for implementation in implementations:
+            compact._msgpack = implementation
+            for data in accepted:
+                compact.unpack(data)
+            for data in rejected:
+                self.assertRaises(ValueError, compact.unpack, data)
+
+    def test_accelerated(self):
+        if self._msgpack is None:
+            self.skipTest('msgpack is not installed')
+        value = {'b': [1, -200, 2.5, b'raw'], 'a': {'z': None, 'y': 'text'}}
+        expected = compact.pack(value)
+        compact._msgpack = self._msgpack
+        self.assertEqual(expected, compact.pack(value))
+        self.assertEqual(value, compact.unpack(expected))
+
+
 class TestCrashNicely(unittest.TestCase):
 
     def setUp(self):
@@ -0,0 +1,115 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+'''
+    Trace
+
+    Hook points in the frame pipeline. Functions decorated with traced()
+    report each call to every registered hook, as an Event with the trace
+    point's name, the type and size of the frame involved, the time taken
+    and any exception raised. While no hooks are registered, a traced call
+    costs one extra function call and a list check.
+
+    Trace points:
+        createFrame, unpack, decrypt, verify    Frame parsing and decoding
+        route, owrite                           Client receiving and sending
+        jack_recv, jack_send                    Jack traffic, as raw data
+'''
+
+import functools
+from collections import namedtuple
+
+from ejtp.metrics import clock
+
+# Called with an Event after every traced call
+hooks = []
+
+Event = namedtuple('Event', 'point frame_type size seconds error obj')
+
+def register(hook):
+    '''
+    Add a hook, called with an Event after each traced call.
+
+    >>> events = []
+    >>> register(events.append)
+    >>> @traced('example')
+    ... def parse(data):
+    ...     return len(data)
+    >>> parse(b'j\\x00"hello"')
+    9
+    >>> event = events[0]
+    >>> event.point, event.frame_type, event.size, event.error
+    ('example', 'j', 9, None)
+    >>> unregister(events.append)
+    >>> hooks
+    []
+    '''
+    hooks.append(hook)
+
+def unregister(hook):
+    hooks.remove(hook)
+
+def traced(point, arg=0):
+    '''
+    Decorate a function as a trace point. arg is the position of the
+    argument holding the frame or data to describe.
+    '''
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not hooks:
+                return func(*args, **kwargs)
+            error = None
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                seconds = clock() - start
+                obj = args[arg] if len(args) > arg else None
+                frame_type, size = describe(obj)
+                event = Event(point, frame_type, size, seconds, error, obj)
+                for hook in list(hooks):
+                    hook(event)
+        return wrapper
+    return decorate
+
+def describe(obj):
+    '''
+    Return the type character and size of a frame, or of raw frame data.
+
+    >>> describe(b'r["local",null,"a"]\\x00')
+    ('r', 20)
+    >>> describe(None)
+    (None, 0)
+    '''
+    content = getattr(obj, 'content', obj)
+    try:
+        size = len(content)
+        first = content[0]
+    except (TypeError, IndexError, KeyError):
+        return (None, 0)
+    if hasattr(first, 'export'): # RawData
+        first = first.export()
+    if isinstance(first, bytes):
+        first = first.decode('latin-1')
+    elif not isinstance(first, str):
+        first = chr(first)
+    return (first, size)
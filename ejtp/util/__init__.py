@@ -18,6 +18,8 @@ along with the Python EJTP library.  If not, see
 
 
 __all__ = [
+	'compact',
 	'crashnicely',
 	'hasher',
+	'logsample',
 ]
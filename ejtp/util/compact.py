@@ -0,0 +1,327 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+
+'''
+    Compact binary serialization.
+
+    A MessagePack-compatible encoding used by ejtp.frame.packed. Unlike
+    JSON through strict(), binary data is carried natively instead of as a
+    list of integers. Map entries are ordered by their encoded key bytes,
+    so equal objects always produce equal output and hash the same.
+
+    The msgpack module is used when it is installed, otherwise the pure
+    Python implementation here does the work. Both produce identical bytes.
+'''
+
+import struct
+
+from persei import RawData, String
+
+from ejtp.util.compat import is_py3k, text_type, integer_types
+
+__all__ = ['pack', 'unpack']
+
+try:
+    import msgpack as _msgpack
+except ImportError:
+    _msgpack = None
+
+# Dicts only keep insertion order (which the accelerated path relies on
+# for canonical map ordering) from python 3.7 onward.
+import sys
+if sys.version_info < (3, 7):
+    _msgpack = None
+
+def pack(obj):
+    '''
+    Serialize obj to bytes.
+
+    >>> pack({'b': 1, 'a': [True, None]}) == b'\\x82\\xa1a\\x92\\xc3\\xc0\\xa1b\\x01'
+    True
+    '''
+    if _msgpack is not None:
+        try:
+            return _msgpack.packb(_canonical(obj), use_bin_type=True)
+        except OverflowError:
+            raise ValueError('integer out of range to pack')
+    parts = []
+    _pack(obj, parts.append)
+    return b''.join(parts)
+
+def unpack(data):
+    '''
+    Deserialize bytes (or RawData) produced by pack.
+
+    >>> unpack(pack([1, -1, 2.5, b'raw'])) == [1, -1, 2.5, b'raw']
+    True
+    '''
+    if isinstance(data, RawData):
+        data = data.export()
+    if _msgpack is not None:
+        try:
+            return _msgpack.unpackb(data, raw=False, strict_map_key=False)
+        except _msgpack.ExtraData:
+            raise ValueError('trailing data after packed object')
+        except Exception as e:
+            raise ValueError('could not unpack data: %s' % e)
+    data = bytearray(data)
+    obj, offset = _unpack(data, 0)
+    if offset != len(data):
+        raise ValueError('trailing data after packed object')
+    return obj
+
+# Encoding ---------------------------------------------------------------------
+
+def _pack(obj, write):
+    if obj is None:
+        write(b'\xc0')
+    elif obj is True:
+        write(b'\xc3')
+    elif obj is False:
+        write(b'\xc2')
+    elif isinstance(obj, integer_types):
+        _pack_int(obj, write)
+    elif isinstance(obj, float):
+        write(b'\xcb' + struct.pack('>d', obj))
+    elif isinstance(obj, (text_type, String)):
+        if isinstance(obj, String):
+            obj = obj.export()
+        _pack_str(obj.encode('utf-8'), write)
+    elif isinstance(obj, (RawData, bytearray)) or (is_py3k and isinstance(obj, bytes)):
+        if isinstance(obj, RawData):
+            obj = obj.export()
+        _pack_bin(bytes(obj), write)
+    elif isinstance(obj, str):
+        # python 2 native strings are treated as text, like strict() does
+        _pack_str(obj, write)
+    elif isinstance(obj, (list, tuple)):
+        _pack_header(len(obj), 0x90, 16, b'\xdc', b'\xdd', write)
+        for item in obj:
+            _pack(item, write)
+    elif isinstance(obj, dict):
+        _pack_header(len(obj), 0x80, 16, b'\xde', b'\xdf', write)
+        for key, value in _sorted_items(obj):
+            write(key)
+            _pack(value, write)
+    else:
+        raise TypeError('can not pack object of type %s' % type(obj).__name__)
+
+def _pack_int(n, write):
+    if 0 <= n < 0x80:
+        write(struct.pack('B', n))
+    elif -0x20 <= n < 0:
+        write(struct.pack('b', n))
+    elif n >= 0:
+        if n < 0x100:
+            write(b'\xcc' + struct.pack('>B', n))
+        elif n < 0x10000:
+            write(b'\xcd' + struct.pack('>H', n))
+        elif n < 0x100000000:
+            write(b'\xce' + struct.pack('>I', n))
+        elif n < 0x10000000000000000:
+            write(b'\xcf' + struct.pack('>Q', n))
+        else:
+            raise ValueError('integer too large to pack')
+    else:
+        if n >= -0x80:
+            write(b'\xd0' + struct.pack('>b', n))
+        elif n >= -0x8000:
+            write(b'\xd1' + struct.pack('>h', n))
+        elif n >= -0x80000000:
+            write(b'\xd2' + struct.pack('>i', n))
+        elif n >= -0x8000000000000000:
+            write(b'\xd3' + struct.pack('>q', n))
+        else:
+            raise ValueError('integer too small to pack')
+
+def _pack_str(data, write):
+    size = len(data)
+    if size < 32:
+        write(struct.pack('B', 0xa0 | size))
+    elif size < 0x100:
+        write(b'\xd9' + struct.pack('>B', size))
+    elif size < 0x10000:
+        write(b'\xda' + struct.pack('>H', size))
+    else:
+        write(b'\xdb' + struct.pack('>I', size))
+    write(data)
+
+def _pack_bin(data, write):
+    size = len(data)
+    if size < 0x100:
+        write(b'\xc4' + struct.pack('>B', size))
+    elif size < 0x10000:
+        write(b'\xc5' + struct.pack('>H', size))
+    else:
+        write(b'\xc6' + struct.pack('>I', size))
+    write(data)
+
+def _pack_header(size, fixbase, fixlimit, head16, head32, write):
+    if size < fixlimit:
+        write(struct.pack('B', fixbase | size))
+    elif size < 0x10000:
+        write(head16 + struct.pack('>H', size))
+    else:
+        write(head32 + struct.pack('>I', size))
+
+def _sorted_items(obj):
+    # (packed key, value) pairs ordered by packed key, the canonical order
+    items = []
+    for key in obj:
+        parts = []
+        _pack(key, parts.append)
+        items.append((b''.join(parts), obj[key]))
+    items.sort(key=lambda item: item[0])
+    return items
+
+def _canonical(obj):
+    # Convert obj to types msgpack understands, with dicts in canonical order
+    if isinstance(obj, dict):
+        result = {}
+        for packed, key in sorted(((pack(key), key) for key in obj), key=lambda item: item[0]):
+            result[_canonical_scalar(key)] = _canonical(obj[key])
+        return result
+    elif isinstance(obj, (list, tuple)):
+        return [_canonical(item) for item in obj]
+    return _canonical_scalar(obj)
+
+def _canonical_scalar(obj):
+    if isinstance(obj, (String, RawData)):
+        return obj.export()
+    elif isinstance(obj, bytearray):
+        return bytes(obj)
+    return obj
+
+# Decoding ---------------------------------------------------------------------
+
+# Deepest nesting of arrays and maps accepted, the same as msgpack's limit
+MAX_DEPTH = 1024
+
+# Marks a map waiting for its next key
+_nokey = object()
+
+_fixed = {
+    0xc0: None,
+    0xc2: False,
+    0xc3: True,
+}
+
+# type byte: (struct format, size) for fixed-width numbers
+_numbers = {
+    0xca: ('>f', 4),
+    0xcb: ('>d', 8),
+    0xcc: ('>B', 1),
+    0xcd: ('>H', 2),
+    0xce: ('>I', 4),
+    0xcf: ('>Q', 8),
+    0xd0: ('>b', 1),
+    0xd1: ('>h', 2),
+    0xd2: ('>i', 4),
+    0xd3: ('>q', 8),
+}
+
+# type byte: (kind, struct format, size) for length-prefixed values
+_sized = {
+    0xc4: ('bin', '>B', 1),
+    0xc5: ('bin', '>H', 2),
+    0xc6: ('bin', '>I', 4),
+    0xd9: ('str', '>B', 1),
+    0xda: ('str', '>H', 2),
+    0xdb: ('str', '>I', 4),
+    0xdc: ('array', '>H', 2),
+    0xdd: ('array', '>I', 4),
+    0xde: ('map', '>H', 2),
+    0xdf: ('map', '>I', 4),
+}
+
+def _read(data, offset, size):
+    end = offset + size
+    if end > len(data):
+        raise ValueError('truncated packed data')
+    return bytes(data[offset:end]), end
+
+def _unpack(data, offset):
+    # Decode the object at offset, without recursion so that deep nesting
+    # is a ValueError. Open containers are [result, items left, map key].
+    stack = []
+    while True:
+        value, offset, length = _unpack_head(data, offset)
+        if length is not None:
+            if len(stack) >= MAX_DEPTH:
+                raise ValueError('packed data nested too deeply')
+            if length:
+                stack.append([value, length, _nokey])
+                continue
+        # value is complete, so add it to the containers it finishes
+        while stack:
+            top = stack[-1]
+            if isinstance(top[0], list):
+                top[0].append(value)
+            elif top[2] is _nokey:
+                if isinstance(value, (list, dict)):
+                    raise ValueError('unhashable map key')
+                top[2] = value
+                break
+            else:
+                top[0][top[2]] = value
+                top[2] = _nokey
+            top[1] -= 1
+            if top[1]:
+                break
+            value = stack.pop()[0]
+        else:
+            return value, offset
+
+def _unpack_head(data, offset):
+    # (value, offset, length) for the item at offset. For arrays and maps,
+    # value is the empty container and length its number of entries.
+    if offset >= len(data):
+        raise ValueError('truncated packed data')
+    byte = data[offset]
+    offset += 1
+    if byte < 0x80:
+        return byte, offset, None
+    elif byte >= 0xe0:
+        return byte - 0x100, offset, None
+    elif byte < 0x90:
+        return {}, offset, byte & 0x0f
+    elif byte < 0xa0:
+        return [], offset, byte & 0x0f
+    elif byte < 0xc0:
+        raw, offset = _read(data, offset, byte & 0x1f)
+        return raw.decode('utf-8'), offset, None
+    elif byte in _fixed:
+        return _fixed[byte], offset, None
+    elif byte in _numbers:
+        fmt, size = _numbers[byte]
+        raw, offset = _read(data, offset, size)
+        return struct.unpack(fmt, raw)[0], offset, None
+    elif byte in _sized:
+        kind, fmt, size = _sized[byte]
+        raw, offset = _read(data, offset, size)
+        length = struct.unpack(fmt, raw)[0]
+        if kind == 'array':
+            return [], offset, length
+        elif kind == 'map':
+            return {}, offset, length
+        raw, offset = _read(data, offset, length)
+        if kind == 'str':
+            return raw.decode('utf-8'), offset, None
+        return raw, offset, None
+    raise ValueError('unsupported packed type 0x%02x' % byte)
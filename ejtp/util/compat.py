@@ -18,10 +18,22 @@ along with the Python EJTP library.  If not, see
 
 import sys
 
-if (2, 7) <= sys.version_info[:2] < (3, 0) or sys.version_info >= (3, 2):
-    import unittest
-else:
-    import unittest2 as unittest
+def _unittest():
+    if (2, 7) <= sys.version_info[:2] < (3, 0) or sys.version_info >= (3, 2):
+        import unittest
+    else:
+        import unittest2 as unittest
+    return unittest
+
+def __getattr__(name):
+    # unittest is only needed by the tests, so import it on first use
+    if name == 'unittest':
+        return _unittest()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+if sys.version_info < (3, 7):
+    # No module __getattr__
+    unittest = _unittest()
 
 # Same as sys.version_info.major, but supports pre-2.7
 is_py3k = sys.version_info[0] == 3
@@ -31,3 +43,25 @@ try:
     from cStringIO import StringIO
 except ImportError:
     from io import StringIO
+
+# Unicode text and integer types, for code that must tell text from bytes
+if is_py3k:
+    text_type = str
+    integer_types = (int,)
+else:
+    text_type = unicode
+    integer_types = (int, long)
+
+# importlib is new in Python 2.7
+try:
+    from importlib import import_module
+except ImportError:
+    def import_module(name):
+        __import__(name)
+        return sys.modules[name]
+
+# OrderedDict is new in Python 2.7, backported as ordereddict
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
@@ -0,0 +1,55 @@
+'''
+This file is part of the Python EJTP library.
+
+The Python EJTP library is free software: you can redistribute it 
+and/or modify it under the terms of the GNU Lesser Public License as
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+the Python EJTP library is distributed in the hope that it will be 
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser Public License for more details.
+
+You should have received a copy of the GNU Lesser Public License
+along with the Python EJTP library.  If not, see 
+<http://www.gnu.org/licenses/>.
+'''
+
+'''
+    Log sampling
+
+    Per-frame log lines in the router, clients and jacks are logged at
+    DEBUG, with their arguments formatted only if the record is emitted.
+    To watch a busy router without logging every frame, attach a
+    SampleFilter to the logger (or handler) to keep one record in N:
+
+        logging.getLogger('ejtp.router').addFilter(SampleFilter(100))
+'''
+
+import logging
+import threading
+
+class SampleFilter(logging.Filter):
+    '''
+    Pass every nth record at or below level, and all records above it.
+
+    >>> sampler = SampleFilter(3)
+    >>> record = logging.LogRecord('ejtp', logging.DEBUG, '', 0, 'frame', (), None)
+    >>> [sampler.filter(record) for i in range(6)]
+    [True, False, False, True, False, False]
+    '''
+    def __init__(self, n, level=logging.DEBUG):
+        logging.Filter.__init__(self)
+        self.n = n
+        self.level = level
+        self._seen = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        with self._lock:
+            seen = self._seen
+            self._seen += 1
+        return seen % self.n == 0
@@ -178,7 +178,9 @@ def get_encryptor():
         enc = [etype, amount]
     else:
         amount = confirm(get_crypto_bits)
+        from ejtp.config import configure_keypool
         from ejtp.crypto.rsa import RSA
+        configure_keypool()
         try:
             print("Generating... if it takes awhile, wiggle your mouse.")
             enc = RSA(None, amount).proto()
@@ -66,6 +66,7 @@ setup(
 		'ejtp',
 		'ejtp.applications',
 		'ejtp.applications.ejforward',
+		'ejtp.bench',
 		'ejtp.crypto',
 		'ejtp.frame',
 		'ejtp.identity',